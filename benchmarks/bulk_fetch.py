@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import nav_server
+from data_sources import CallableSource, HttpSource
+from nav_store import NavStore
+
+
+def bulk_refresh(source, symbols, history_start, end):
+    with tempfile.TemporaryDirectory(prefix='nav-bulk-') as root:
+        store = NavStore(root=root, downloader=source)
+        started = time.perf_counter()
+        failures = store.refresh(symbols, history_start, end)
+        return time.perf_counter() - started, failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Times a bulk NavStore.refresh against the local NAV stand-in server')
+    parser.add_argument('--symbols', type=int, default=300)
+    parser.add_argument('--failing', type=int, default=5, help='symbols the server answers with an error')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds of simulated network latency per request')
+    parser.add_argument('--format', choices=['csv', 'json'], default='csv')
+    parser.add_argument('--limit-per-host', type=int, default=50)
+    parser.add_argument('--sequential', action='store_true', help='also time one request at a time')
+    args = parser.parse_args()
+
+    server, base_url = nav_server.serve(latency=args.latency)
+    symbols = [f'0PSYND{i:04d}.BO' for i in range(args.symbols)]
+    symbols += [f'{nav_server.ERROR_PREFIX}{i:04d}.BO' for i in range(args.failing)]
+    url = base_url + '/nav/{symbol}.' + args.format + '?start={start}&end={end}'
+    date_format = '%d-%m-%Y' if args.format == 'json' else None
+
+    # Responses are rendered up front, so the timing is the client's and not the stand-in's
+    for symbol in symbols:
+        nav_server.render(symbol, args.format, '2010-01-01', '2030-01-01')
+
+    http = HttpSource(url, date_format=date_format, limit_per_host=args.limit_per_host, retries=1, backoff=0.05)
+    seconds, failures = bulk_refresh(http, symbols, '2010-01-01', '2030-01-01')
+    print(f'concurrent: {len(symbols)} symbols in {seconds:.2f}s, {len(failures)} failed')
+
+    if args.sequential:
+        seconds, failures = bulk_refresh(CallableSource(http.fetch), symbols, '2010-01-01', '2030-01-01')
+        print(f'sequential: {len(symbols)} symbols in {seconds:.2f}s, {len(failures)} failed')
+    server.shutdown()
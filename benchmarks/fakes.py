@@ -0,0 +1,91 @@
+import datetime
+import functools
+import tempfile
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import ratios
+from nav_store import NavStore
+
+CATEGORIES = ['Large Cap', 'Large & Mid Cap', 'Mid Cap', 'Small Cap', 'Focused', 'ELSS', 'Multi Cap', 'Value']
+
+# Synthetic histories all start here, so every requested range is a slice of the same series
+EPOCH = pd.Timestamp('2000-01-03')
+
+
+@functools.lru_cache(maxsize=None)
+def _business_days():
+    # Same days as pd.bdate_range(EPOCH, today), which is far slower per call
+    days = np.arange(EPOCH.to_datetime64(), np.datetime64(datetime.date.today()) + 1, dtype='datetime64[D]')
+    return days[np.is_busday(days)].astype('datetime64[ns]')
+
+
+@functools.lru_cache(maxsize=None)
+def synthetic_nav(symbol):
+    """
+    Deterministic NAV history of a symbol: a geometric random walk over business days, seeded by the symbol,
+    with ~2% of days missing as holidays.
+    """
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    dates = _business_days()
+    dates = dates[rng.random(len(dates)) > 0.02]
+    nav = 10 * np.exp(np.cumsum(rng.normal(0.0005, 0.011, len(dates))))
+    return pd.DataFrame({'date': dates, 'nav': nav})
+
+
+def fake_downloader(symbol, start, end):
+    # Same contract as data_sources.YFinanceSource.fetch, end is exclusive
+    nav_df = synthetic_nav(symbol)
+    dates = nav_df['date']
+    return nav_df[(dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end))].reset_index(drop=True)
+
+
+class FakeMftool:
+    def get_scheme_info(self, scheme_code, as_json=False):
+        return {'scheme_code': scheme_code, 'shortName': f'Synthetic {scheme_code}', 'symbol': f'{scheme_code}.BO'}
+
+    def history(self, code, start=None, end=None, period=None, as_dataframe=True):
+        return synthetic_nav(f'{code}.BO').set_index('date')
+
+
+def synthetic_reference_data(n_funds):
+    """
+    :return: (schemes, eq_schemes) shaped like scheme_details.csv and equity_schemes.csv,
+    with a Direct Growth and a Regular IDCW plan per fund
+    """
+    benchmarks = [name + ' Total Return Index' for name in ratios.YFINANCE_INDEX_CODES]
+    # Short enough that shortName, truncated to 31 characters, stays unique per fund
+    names = [f'SYN{i:04d} {CATEGORIES[i % len(CATEGORIES)]} Fund' for i in range(n_funds)]
+
+    eq_schemes = pd.DataFrame({
+        'scheme_name': names,
+        'category': [CATEGORIES[i % len(CATEGORIES)] for i in range(n_funds)],
+        'benchmark': [benchmarks[i % len(benchmarks)] for i in range(n_funds)],
+    })
+
+    rows = []
+    for i, name in enumerate(names):
+        for plan, suffix in (('D', 'Dir Gr'), ('R', 'Reg IDCW')):
+            code = f'0PSYN{plan}{i:04d}'
+            rows.append({
+                'schemeCode': code,
+                'shortName': name[:31],
+                'longName': f'{name} {suffix}',
+                'symbol': f'{code}.BO',
+            })
+    return pd.DataFrame(rows), eq_schemes
+
+
+def install(n_funds, nav_root=None):
+    """
+    Points ratios at synthetic reference data, a fake Mftool and a NavStore backed by fake_downloader,
+    so nothing touches the network. Result memoization is turned off, so timed calls compute their results.
+    :return: list of fund names of the synthetic universe
+    """
+    schemes, eq_schemes = synthetic_reference_data(n_funds)
+    ratios.set_reference_data(schemes, eq_schemes, mf=FakeMftool())
+    ratios.nav_store = NavStore(root=nav_root or tempfile.mkdtemp(prefix='nav-bench-'), downloader=fake_downloader)
+    ratios.result_cache = None
+    return list(eq_schemes['scheme_name'])
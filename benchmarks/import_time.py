@@ -0,0 +1,51 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each snippet runs in a fresh interpreter, so nothing is shared between runs
+SNIPPETS = {
+    'import ratios': "import ratios",
+    'convert_period_to_days': "import ratios; ratios.convert_period_to_days('1y')",
+    'load reference data': "import ratios; ratios.get_resolver()",
+}
+
+
+def time_snippet(snippet, repeat):
+    code = (
+        "import time; t = time.perf_counter()\n"
+        f"{snippet}\n"
+        "print(time.perf_counter() - t)"
+    )
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, check=True, capture_output=True, text=True)
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def run(repeat=5):
+    results = {}
+    for name, snippet in SNIPPETS.items():
+        timings = time_snippet(snippet, repeat)
+        results[name] = {'median_s': statistics.median(timings), 'min_s': min(timings), 'runs': timings}
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Startup cost of importing ratios, in fresh interpreters')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    for name, result in results.items():
+        print(f"{name:<24} median {result['median_s']*1000:8.1f} ms   min {result['min_s']*1000:8.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
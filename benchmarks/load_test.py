@@ -0,0 +1,115 @@
+import argparse
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlparse
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import fakes
+import ratios
+import service
+from memo import ResultCache
+from nav_store import NavStore
+
+
+def query_mix(funds, rng, n):
+    """
+    :return: n request paths, mostly rolling returns and risk of a few popular funds, as a dashboard would send
+    """
+    # Zipf-like popularity, a handful of funds get most of the traffic
+    weights = 1 / np.arange(1, len(funds) + 1)
+    picks = rng.choice(len(funds), size=n, p=weights / weights.sum())
+    kinds = rng.choice(['rolling_returns', 'risk', 'multi_window_returns', 'sip', 'scheme'], size=n,
+                       p=[0.4, 0.25, 0.15, 0.1, 0.1])
+    paths = []
+    for fund, kind in zip(picks, kinds):
+        params = {'fund': funds[fund]}
+        if kind in ('rolling_returns', 'risk', 'sip'):
+            params['window'] = rng.choice(['1y', '3y', '5y'])
+        if kind == 'rolling_returns':
+            params['cagr'] = 'true'
+        paths.append(f'/{kind}?{urlencode(params)}')
+    return paths
+
+
+def run(base_url, paths, concurrency):
+    """
+    Sends paths from concurrency threads, each over one keep-alive connection.
+    :return: (latencies in seconds, non-200 responses, wall seconds)
+    """
+    url = urlparse(base_url)
+    latencies = np.zeros(len(paths))
+    failures = []
+    next_path = iter(range(len(paths)))
+    lock = threading.Lock()
+
+    def worker():
+        connection = http.client.HTTPConnection(url.hostname, url.port)
+        while True:
+            with lock:
+                i = next(next_path, None)
+            if i is None:
+                break
+            started = time.perf_counter()
+            connection.request('GET', paths[i])
+            response = connection.getresponse()
+            response.read()
+            latencies[i] = time.perf_counter() - started
+            if response.status != 200:
+                failures.append((paths[i], response.status))
+        connection.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, failures, time.perf_counter() - started
+
+
+def report(label, latencies, failures, seconds):
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+    print(f'{label}: {len(latencies)} requests in {seconds:.2f}s ({len(latencies) / seconds:.0f}/s), '
+          f'p50 {p50:.1f}ms p90 {p90:.1f}ms p99 {p99:.1f}ms max {latencies.max() * 1000:.1f}ms, '
+          f'{len(failures)} failed')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test of the query service, against a synthetic in-process one by default')
+    parser.add_argument('--url', help='base url of a running service, its funds are given with --funds')
+    parser.add_argument('--funds', nargs='*', help='fund names to query, defaults to the synthetic universe')
+    parser.add_argument('--universe', type=int, default=50, help='funds of the synthetic universe')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    base_url, funds = args.url, args.funds
+    if base_url is None:
+        synthetic = fakes.install(args.universe)
+        ratios.result_cache = ResultCache()
+        ratios.nav_store = NavStore(root=tempfile.mkdtemp(prefix='nav-load-'), downloader=fakes.fake_downloader,
+                                    keep_loaded=True)
+        server, base_url = service.serve(service.QueryService(), port=0)
+        funds = funds or synthetic
+    if not funds:
+        parser.error('--funds is required with --url')
+
+    paths = query_mix(funds, np.random.default_rng(args.seed), args.requests)
+    # The first pass computes, the second one is what a warm service serves
+    report('cold', *run(base_url, paths, args.concurrency))
+    report('warm', *run(base_url, paths, args.concurrency))
+
+    connection = http.client.HTTPConnection(urlparse(base_url).hostname, urlparse(base_url).port)
+    connection.request('GET', '/stats')
+    stats = json.loads(connection.getresponse().read())
+    print(f"coalesced {stats['coalesced']} of {stats['requests']} requests, result cache {stats.get('resultCache')}")
@@ -0,0 +1,111 @@
+import argparse
+import collections
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakes
+import service
+
+# Symbols starting with these prefixes answer 404 and 500, to exercise partial failures
+MISSING_PREFIX = 'MISSING'
+ERROR_PREFIX = 'ERROR'
+# Symbols starting with this prefix answer 500 to their first request only, to exercise retries
+FLAKY_PREFIX = 'FLAKY'
+
+
+class NavHandler(BaseHTTPRequestHandler):
+    """
+    Serves canned synthetic NAVs of fakes.synthetic_nav at /nav/<symbol>.csv and /nav/<symbol>.json,
+    optionally sliced by start and end query parameters. JSON is shaped like mfapi.in.
+    requests counts the NAV requests of every symbol.
+    """
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    requests = collections.Counter()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        name = os.path.basename(url.path)
+        symbol, _, format = name.rpartition('.')
+        if not url.path.startswith('/nav/') or format not in ('csv', 'json'):
+            return self._send(404, 'text/plain', b'not found')
+
+        time.sleep(self.latency)
+        with self.lock:
+            self.requests[symbol] += 1
+            first = self.requests[symbol] == 1
+        if symbol.startswith(MISSING_PREFIX):
+            return self._send(404, 'text/plain', b'unknown symbol')
+        if symbol.startswith(ERROR_PREFIX):
+            return self._send(500, 'text/plain', b'server error')
+        if symbol.startswith(FLAKY_PREFIX) and first:
+            return self._send(503, 'text/plain', b'try again')
+
+        query = parse_qs(url.query)
+        content_type, body = render(symbol, format, query.get('start', [None])[0], query.get('end', [None])[0])
+        return self._send(200, content_type, body)
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@functools.lru_cache(maxsize=None)
+def render(symbol, format, start=None, end=None):
+    """
+    :return: (content type, body) of a canned response, rendered once per request
+    """
+    nav_df = fakes.synthetic_nav(symbol)
+    if start is not None:
+        nav_df = nav_df[nav_df['date'] >= pd.Timestamp(start)]
+    if end is not None:
+        nav_df = nav_df[nav_df['date'] < pd.Timestamp(end)]
+
+    if format == 'csv':
+        return 'text/csv', nav_df.to_csv(index=False, date_format='%Y-%m-%d').encode()
+
+    records = [{'date': date.strftime('%d-%m-%Y'), 'nav': f'{nav:.4f}'}
+               for date, nav in zip(nav_df['date'], nav_df['nav'])]
+    return 'application/json', json.dumps({'meta': {'symbol': symbol}, 'data': records}).encode()
+
+
+def serve(host='127.0.0.1', port=0, latency=0.0):
+    """
+    Starts the stand-in server on a background thread.
+    :param latency: seconds every NAV request is delayed by, to stand in for a remote host
+    :return: (server, base_url), stop with server.shutdown(), server.RequestHandlerClass.requests counts requests
+    """
+    handler = type('Handler', (NavHandler,), {'latency': latency, 'requests': collections.Counter()})
+    return service.start_server(handler, host, port)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local HTTP stand-in serving synthetic NAV CSV/JSON')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, base_url = serve(args.host, args.port, args.latency)
+    print(f'Serving {base_url}/nav/<symbol>.csv and {base_url}/nav/<symbol>.json')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
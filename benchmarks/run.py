@@ -0,0 +1,202 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+import fakes
+import graphs
+import ratios
+from memo import ResultCache
+from universe import Universe
+
+HISTORIES = ['1y', '5y', '15y']
+FUND_COUNTS = [1, 50, 500]
+
+
+def rolling_returns_case(funds, history):
+    def run():
+        for fund in funds:
+            ratios.Measures(fund).rolling_returns('1y', history)
+    return run
+
+
+def memoized_rolling_returns_case(funds, history):
+    # Memo hits of rolling_returns, fakes.install turns memoization off for every other case
+    cache = ResultCache(max_entries=len(funds) + 1)
+
+    def run():
+        ratios.result_cache = cache
+        try:
+            for fund in funds:
+                ratios.Measures(fund).rolling_returns('1y', history)
+        finally:
+            ratios.result_cache = None
+    return run
+
+
+def cagr_rolling_returns_case(funds, history):
+    def run():
+        for fund in funds:
+            ratios.Measures(fund).cagr_rolling_returns('3y', history)
+    return run
+
+
+def universe_cagr_rolling_returns_case(funds, history):
+    def run():
+        Universe(funds, period=history, benchmarks=False).cagr_rolling_returns('3y')
+    return run
+
+
+def scheme_details_case(funds, history):
+    def run():
+        for fund in funds:
+            ratios.SchemeDetails(fund)
+    return run
+
+
+def find_schemes_case(funds, history):
+    def run():
+        for fund in funds:
+            # A partly typed name, as when searching on every keystroke
+            ratios.find_schemes(fund[:12], plan='direct')
+    return run
+
+
+def convert_period_to_date_case(funds, history):
+    def run():
+        for _ in range(1000):
+            ratios.convert_period_to_date(history)
+    return run
+
+
+def graphs_rolling_returns_case(funds, history):
+    frames = [ratios.Measures(fund).rolling_returns('1y', history) for fund in funds]
+
+    def run():
+        graphs.rolling_returns(frames, 'W')
+        plt.close('all')
+    return run
+
+
+def graphs_rolling_returns_lttb_case(funds, history):
+    frames = [ratios.Measures(fund).rolling_returns('1y', history) for fund in funds]
+
+    def run():
+        graphs.rolling_returns(frames, None, downsample='lttb', max_points=500, legend=False)
+        plt.close('all')
+    return run
+
+
+# name -> (case factory, whether the case depends on the number of funds)
+CASES = {
+    'rolling_returns': (rolling_returns_case, True),
+    'memoized_rolling_returns': (memoized_rolling_returns_case, True),
+    'cagr_rolling_returns': (cagr_rolling_returns_case, True),
+    'universe_cagr_rolling_returns': (universe_cagr_rolling_returns_case, True),
+    'scheme_details': (scheme_details_case, True),
+    'find_schemes': (find_schemes_case, True),
+    'convert_period_to_date': (convert_period_to_date_case, False),
+    'graphs_rolling_returns': (graphs_rolling_returns_case, True),
+    'graphs_rolling_returns_lttb': (graphs_rolling_returns_lttb_case, True),
+}
+
+
+def time_case(run, repeat):
+    # The first call warms the NAV store and resolver caches and is not counted
+    run()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return {'median_s': statistics.median(timings), 'min_s': min(timings), 'runs': timings}
+
+
+def run_suite(cases, histories, fund_counts, repeat):
+    with tempfile.TemporaryDirectory(prefix='nav-bench-') as nav_root:
+        funds = fakes.install(max(fund_counts), nav_root)
+        return _run_cases(cases, histories, fund_counts, repeat, funds)
+
+
+def _run_cases(cases, histories, fund_counts, repeat, funds):
+    results = {}
+    for name in cases:
+        factory, uses_funds = CASES[name]
+        for history in histories:
+            for n_funds in (fund_counts if uses_funds else [None]):
+                key = f'{name}[{history}]' if n_funds is None else f'{name}[{history} x {n_funds}]'
+                results[key] = time_case(factory(funds[:n_funds or 1], history), repeat)
+                print(f"{key:<48} median {results[key]['median_s']*1000:10.2f} ms")
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+    }
+
+
+def compare(baseline, results, threshold):
+    """
+    :return: list of (case, baseline median, new median) for cases slower than threshold x baseline
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline['results']:
+            continue
+        before = baseline['results'][key]['median_s']
+        after = result['median_s']
+        print(f'{key:<48} {before*1000:10.2f} ms -> {after*1000:10.2f} ms  x{after/before:5.2f}')
+        if after > before * threshold:
+            regressions.append((key, before, after))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline benchmarks of the ratios and graphs hot paths on synthetic NAVs')
+    parser.add_argument('--cases', default=','.join(CASES), help='comma separated, from: ' + ', '.join(CASES))
+    parser.add_argument('--histories', default=','.join(HISTORIES))
+    parser.add_argument('--funds', default=','.join(map(str, FUND_COUNTS)))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file from an earlier run')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio flagged as a regression')
+    args = parser.parse_args()
+
+    results = run_suite(args.cases.split(','), args.histories.split(','), [int(n) for n in args.funds.split(',')], args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'meta': metadata(), 'results': results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        for key, before, after in regressions:
+            print(f'REGRESSION {key}: {before*1000:.2f} ms -> {after*1000:.2f} ms')
+        sys.exit(1 if regressions else 0)
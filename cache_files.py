@@ -0,0 +1,55 @@
+import os
+import tempfile
+
+
+def write_atomic(path, write):
+    """
+    Function to write a file through a temporary file in the same directory that then replaces it,
+    so readers only ever see a complete file. Every call writes its own temporary file, so threads or
+    processes writing the same path at once do not collide, the last one to finish wins.
+    :param write: callable taking the open binary file
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def evict_lru(root, suffix, max_bytes, keep=None):
+    """
+    Function to remove the least recently used files of root ending in suffix until they fit in max_bytes.
+    Recency is the file's mtime, which readers bump with os.utime. keep is never removed.
+    :return: list of removed paths
+    """
+    files = []
+    for name in os.listdir(root):
+        if name.endswith(suffix):
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    removed = []
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            # Already evicted by another writer
+            pass
+        total -= size
+        removed.append(path)
+    return removed
@@ -0,0 +1,112 @@
+import io
+import json
+import random
+import sys
+
+import numpy as np
+
+CODES_PATH = './data/codes.json'
+ALL_CODES_PATH = './data/scheme_codes_all.json'
+# First row of scheme_codes_all.json, the column names of the AMFI list it was exported from
+_ALL_CODES_HEADER = 'Scheme Code'
+
+_SEPARATORS = ' \t\r\n,[]'
+
+
+def iter_codes(path=CODES_PATH, chunk_size=1 << 16):
+    """
+    Function to stream (code, name) pairs from a JSON list of {code: name} objects such as codes.json,
+    decoding one object at a time from fixed size chunks instead of loading the whole document.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in _SEPARATORS:
+                pos += 1
+
+            if pos < len(buffer):
+                try:
+                    row, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # The object is cut off at the end of the chunk, unless the file is done
+                    if eof:
+                        raise
+                else:
+                    yield from row.items()
+                    continue
+            elif eof:
+                return
+
+            chunk = f.read(chunk_size)
+            eof = chunk == ''
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+def iter_all_codes(path=ALL_CODES_PATH):
+    """
+    Function to read (code, name) pairs from scheme_codes_all.json, a single {code: name} object of the AMFI
+    scheme list whose first row is its 'Scheme Code': 'Scheme Name' header.
+    """
+    with open(path, encoding='utf-8') as f:
+        codes = json.load(f)
+    return ((code, name) for code, name in codes.items() if code != _ALL_CODES_HEADER)
+
+
+class CodeTable:
+    """
+    Compact table of scheme codes and names. Codes are interned strings with an O(1) index,
+    names are slices of a single string buffer addressed by an offsets array.
+    Duplicate codes keep their first name.
+    """
+
+    def __init__(self, pairs):
+        self.codes = []
+        self._index = {}
+        names = io.StringIO()
+        offsets = [0]
+        for code, name in pairs:
+            if code in self._index:
+                continue
+            self._index[code] = len(self.codes)
+            self.codes.append(sys.intern(code))
+            offsets.append(offsets[-1] + names.write(name))
+
+        self._names = names.getvalue()
+        self._offsets = np.array(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_json(cls, path=CODES_PATH):
+        return cls(iter_codes(path))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code):
+        return code in self._index
+
+    def __getitem__(self, code):
+        return self.name(self._index[code])
+
+    def get(self, code, default=None):
+        i = self._index.get(code)
+        return default if i is None else self.name(i)
+
+    def name(self, i):
+        return self._names[self._offsets[i]:self._offsets[i + 1]]
+
+    def items(self):
+        for i, code in enumerate(self.codes):
+            yield code, self.name(i)
+
+    def sample(self, n, seed=None):
+        return random.Random(seed).sample(self.codes, min(n, len(self.codes)))
+
+    def shard(self, index, count):
+        """
+        Codes of shard `index` out of `count` disjoint shards of roughly equal size.
+        """
+        return self.codes[index::count]
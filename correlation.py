@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+import rolling_engine
+
+VIEWS = ('all', 'within', 'across')
+
+
+class PairwiseSums:
+    """
+    Sums behind the pairwise complete correlation of every pair of funds, over the dates both have a return.
+    Rows of returns are added and removed in blocks of matrix products, so a rolling window costs each row
+    one addition and one removal whatever the window length, instead of a df.corr() per window.
+    """
+
+    def __init__(self, returns):
+        returns = np.asarray(returns, dtype=float)
+        present = ~np.isnan(returns)
+        self.x, _ = rolling_engine.centre(returns, present)
+        self.m = present.astype(float)
+
+        self.clear()
+
+    def clear(self):
+        funds = self.x.shape[1]
+        self.count = np.zeros((funds, funds))
+        self.sum = np.zeros((funds, funds))
+        self.sum_sq = np.zeros((funds, funds))
+        self.cross = np.zeros((funds, funds))
+
+    def add(self, lo, hi, sign=1):
+        x, m = self.x[lo:hi], self.m[lo:hi]
+        self.count += sign * (m.T @ m)
+        # sum[i, j] is the sum of fund i's returns over the dates fund j has one too
+        self.sum += sign * (x.T @ m)
+        self.sum_sq += sign * ((x*x).T @ m)
+        self.cross += sign * (x.T @ x)
+
+    def remove(self, lo, hi):
+        self.add(lo, hi, sign=-1)
+
+    def correlation(self, min_periods=2):
+        n = self.count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = self.cross - self.sum * self.sum.T / n
+            var = np.maximum(self.sum_sq - self.sum * self.sum / n, 0)
+            corr = cov / np.sqrt(var * var.T)
+        corr = np.clip(corr, -1, 1)
+        return np.where(n >= max(min_periods, 2), corr, np.nan)
+
+
+def correlation_matrix(returns, min_periods=2):
+    """
+    Function to calculate the correlation matrix of a dates x funds returns panel, every pair over the dates
+    both funds have a return, as DataFrame.corr() does, from four matrix products.
+    :return: funds x funds np.ndarray, NaN for pairs with fewer than min_periods common returns
+    """
+    sums = PairwiseSums(returns)
+    sums.add(0, len(sums.x))
+    return sums.correlation(min_periods)
+
+
+def rolling_correlation_matrices(dates, returns, days, step=21, min_periods=2):
+    """
+    Correlation matrices over windows of days, ending on every step-th date counted back from the last one.
+    Only windows fully covered by the dates are evaluated.
+    :return: (end dates, ends x funds x funds np.ndarray), one matrix at a time through iter_rolling_correlation
+    """
+    ends, matrices = [], []
+    for end, corr in iter_rolling_correlation(dates, returns, days, step, min_periods):
+        ends.append(end)
+        matrices.append(corr)
+    funds = np.asarray(returns).shape[1]
+    return np.array(ends, dtype='datetime64[ns]'), np.array(matrices).reshape(len(ends), funds, funds)
+
+
+def iter_rolling_correlation(dates, returns, days, step=21, min_periods=2):
+    """
+    Yields (end date, correlation matrix) of every rolling window, updating the window sums incrementally.
+    """
+    dates = np.asarray(dates).astype('datetime64[ns]')
+    start = rolling_engine.trailing_start_indices(dates, days)
+    ends = np.arange(len(dates) - 1, -1, -step)[::-1]
+    ends = ends[dates[ends] - np.timedelta64(days, 'D') >= dates[0]]
+
+    sums = PairwiseSums(returns)
+    lo = hi = 0
+    for end in ends:
+        window_start = start[end]
+        if window_start >= hi:
+            # No overlap with the previous window, start over rather than add and remove the same rows
+            sums.clear()
+            lo = hi = window_start
+        sums.add(hi, end + 1)
+        sums.remove(lo, window_start)
+        lo, hi = window_start, end + 1
+        yield dates[end], sums.correlation(min_periods)
+
+
+def view_mask(categories, view='all'):
+    """
+    :param view: 'all' pairs, pairs 'within' a category or pairs 'across' categories
+    :return: funds x funds boolean np.ndarray of the pairs in view
+    """
+    if view not in VIEWS:
+        raise ValueError(f"view must be one of {VIEWS}, got {view!r}")
+    categories = np.asarray(categories)
+    same = categories[:, None] == categories[None, :]
+    if view == 'within':
+        return same
+    if view == 'across':
+        return ~same
+    return np.ones(same.shape, dtype=bool)
+
+
+def top_pairs(corr, k, mask=None):
+    """
+    The k most correlated distinct pairs (i < j) of a correlation matrix, among the pairs in mask.
+    :return: (i, j, correlation) np.ndarrays ordered from the most correlated pair
+    """
+    i, j = np.triu_indices(len(corr), k=1)
+    values = corr[i, j]
+    keep = ~np.isnan(values)
+    if mask is not None:
+        keep &= mask[i, j]
+    i, j, values = i[keep], j[keep], values[keep]
+
+    if k < len(values):
+        best = np.argpartition(-values, k)[:k]
+        i, j, values = i[best], j[best], values[best]
+    order = np.argsort(-values, kind='stable')
+    return i[order], j[order], values[order]
+
+
+def pairs_frame(details, i, j, values, date=None):
+    # Long layout of fund pairs, with the scheme name and category of both funds
+    frame = pd.DataFrame({
+        'schemeNameA': details['schemeName'].to_numpy()[i],
+        'categoryA': details['category'].to_numpy()[i],
+        'schemeNameB': details['schemeName'].to_numpy()[j],
+        'categoryB': details['category'].to_numpy()[j],
+        'correlation': values,
+    })
+    if date is not None:
+        frame.insert(0, 'date', date)
+    return frame
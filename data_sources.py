@@ -0,0 +1,198 @@
+import abc
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import instrumentation
+
+
+class BulkResult:
+    """
+    Outcome of DataSource.fetch_many, keyed by the (symbol, start, end) requests.
+    navs holds the frames of requests that succeeded and failures the exception of every one that did not,
+    so one bad symbol does not lose the rest of a bulk refresh.
+    """
+
+    def __init__(self):
+        self.navs = {}
+        self.failures = {}
+        self.seconds = 0.0
+
+    @property
+    def ok(self):
+        return not self.failures
+
+    def __repr__(self):
+        return f'BulkResult({len(self.navs)} fetched, {len(self.failures)} failed in {self.seconds:.2f}s)'
+
+
+class DataSource(abc.ABC):
+    """
+    A source of NAV history. fetch(symbol, start, end) returns a DataFrame with 'date' and 'nav' columns
+    for start <= date < end, as yf.download does, so every source can be used as a NavStore downloader.
+    """
+
+    @abc.abstractmethod
+    def fetch(self, symbol, start, end):
+        pass
+
+    def __call__(self, symbol, start, end):
+        return self.fetch(symbol, start, end)
+
+    def fetch_many(self, requests):
+        """
+        :param requests: iterable of (symbol, start, end)
+        :return: BulkResult
+        """
+        result = BulkResult()
+        started = time.perf_counter()
+        for request in requests:
+            try:
+                result.navs[request] = self.fetch(*request)
+            except Exception as e:
+                result.failures[request] = e
+        result.seconds = time.perf_counter() - started
+        return result
+
+
+class CallableSource(DataSource):
+    """
+    Wraps a plain downloader callable (symbol, start, end) -> DataFrame, fetched one request at a time.
+    """
+
+    def __init__(self, downloader):
+        self.downloader = downloader
+
+    def fetch(self, symbol, start, end):
+        return self.downloader(symbol, start, end)
+
+
+class YFinanceSource(DataSource):
+    """
+    Adjusted close history from Yahoo Finance, the default NavStore downloader.
+    """
+
+    def fetch(self, symbol, start, end):
+        import yfinance as yf
+
+        nav_df = yf.download(symbol, start, end)
+        return nav_df.reset_index()[['Date', 'Adj Close']].rename(columns={'Date': 'date', 'Adj Close': 'nav'})
+
+
+class HttpSource(DataSource):
+    """
+    NAV history served over HTTP as CSV or JSON, fetched concurrently with asyncio and aiohttp.
+    All requests of a fetch_many share one pooled session, with at most limit open connections overall
+    and limit_per_host per host. Every request has its own timeout and is retried with backoff.
+
+    url is a template with {symbol}, {start} and {end} fields, e.g.
+        HttpSource('http://127.0.0.1:8000/nav/{symbol}.csv?start={start}&end={end}')
+    CSV needs 'date' and 'nav' columns (or yfinance's 'Date' and 'Adj Close'). JSON is either a list of
+    {"date", "nav"} records or an object with such records under "data", as served by mfapi.in.
+    Rows outside [start, end) are dropped, so the server may return the full history.
+    """
+
+    def __init__(self, url, format=None, date_format=None, limit=100, limit_per_host=20,
+                 timeout=30, retries=2, backoff=0.5):
+        self.url = url
+        self.format = format
+        self.date_format = date_format
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    def fetch(self, symbol, start, end):
+        request = (symbol, start, end)
+        result = self.fetch_many([request])
+        if request in result.failures:
+            raise result.failures[request]
+        return result.navs[request]
+
+    def fetch_many(self, requests):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.fetch_many_async(requests))
+
+        # asyncio.run cannot be called from a running event loop, such as the one of a Jupyter kernel,
+        # so the requests run on a worker thread with its own loop. Await fetch_many_async instead to share it
+        with ThreadPoolExecutor(1) as pool:
+            return pool.submit(lambda: asyncio.run(self.fetch_many_async(requests))).result()
+
+    async def fetch_many_async(self, requests):
+        import aiohttp
+
+        requests = list(dict.fromkeys(requests))
+        result = BulkResult()
+        started = time.perf_counter()
+
+        connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            responses = await asyncio.gather(*(self._fetch(session, *request) for request in requests),
+                                             return_exceptions=True)
+
+        for request, response in zip(requests, responses):
+            if isinstance(response, BaseException):
+                result.failures[request] = response
+            else:
+                result.navs[request] = response
+        result.seconds = time.perf_counter() - started
+        instrumentation.count('http_fetches', len(result.navs))
+        instrumentation.count('http_failures', len(result.failures))
+        return result
+
+    async def _fetch(self, session, symbol, start, end):
+        import aiohttp
+
+        url = self.url.format(symbol=symbol, start=start, end=end)
+        for attempt in range(self.retries + 1):
+            try:
+                async with session.get(url) as response:
+                    response.raise_for_status()
+                    body = await response.read()
+                    content_type = response.content_type
+                break
+            except aiohttp.ClientResponseError as e:
+                # Client errors such as an unknown symbol will not change on retry
+                if e.status < 500 or attempt == self.retries:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+        nav_df = self.parse(body, content_type)
+        dates = nav_df['date']
+        return nav_df[(dates >= pd.Timestamp(start)) & (dates < pd.Timestamp(end))].reset_index(drop=True)
+
+    def parse(self, body, content_type=None):
+        """
+        :return: pd.DataFrame with 'date' and 'nav' columns from a CSV or JSON response body
+        """
+        format = self.format or ('json' if content_type and 'json' in content_type else 'csv')
+        if format == 'json':
+            records = json.loads(body)
+            if isinstance(records, dict):
+                records = records['data']
+            nav_df = pd.DataFrame.from_records(records, columns=['date', 'nav'])
+        else:
+            nav_df = pd.read_csv(io.BytesIO(body))
+            nav_df = nav_df.rename(columns={'Date': 'date', 'Adj Close': 'nav'})[['date', 'nav']]
+
+        return pd.DataFrame({
+            'date': pd.to_datetime(nav_df['date'], format=self.date_format, cache=False),
+            'nav': pd.to_numeric(nav_df['nav']),
+        })
+
+
+def as_source(downloader):
+    if isinstance(downloader, DataSource):
+        return downloader
+    return CallableSource(downloader)
@@ -1,22 +1,82 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
-def rolling_returns(dfs, period='1m', figsize=(10, 6)):
-    joined = pd.concat(dfs)
-    joined.set_index('date', inplace=True)
-    
-    joined['percentage'] = joined['percentage'].str.rstrip('%').astype(float)
-    joined = joined[['schemeName', 'percentage']].groupby('schemeName').resample(period).mean().reset_index()
-    
+def rolling_returns(dfs, period='1m', figsize=(10, 6), downsample=None, max_points=1000, legend=True):
+    """
+    Plots rolling returns of one or more schemes.
+    :param dfs: list of rolling return frames from Measures, or one long frame such as Universe.rolling_returns
+    :param period: resampling period the returns are averaged over, None to plot every point
+    :param downsample: None, 'lttb' or 'minmax' to plot at most max_points points per scheme
+    """
+    joined = pd.concat(dfs) if isinstance(dfs, (list, tuple)) else dfs
+    joined = joined[['date', 'schemeName']].assign(percentage=joined['ratio'] * 100)
+
+    if period is not None:
+        joined = joined.set_index('date').groupby('schemeName', sort=False).resample(period)['percentage'].mean().reset_index()
+
     plt.figure(figsize=figsize)
-    for scheme in joined['schemeName'].unique():
-        subset = joined[joined['schemeName'] == scheme]
-        plt.plot(subset['date'], subset['percentage'], label=scheme)
-    
+    for scheme, subset in joined.groupby('schemeName', sort=False):
+        subset = subset.dropna()
+        x, y = subset['date'].to_numpy(), subset['percentage'].to_numpy()
+        if downsample is not None:
+            x, y = DOWNSAMPLERS[downsample](x, y, max_points)
+        plt.plot(x, y, label=scheme)
+
     # Customize plot
     plt.xlabel('Date')
     plt.ylabel('Percentage')
     plt.title('Rolling Returns')
-    plt.legend()
+    if legend:
+        plt.legend()
     plt.grid(True)
-    plt.show()
\ No newline at end of file
+    plt.show()
+
+def lttb(x, y, max_points):
+    """
+    Largest-Triangle-Three-Buckets downsampling, keeps the first and last points and from every
+    bucket in between the point forming the largest triangle with its neighbouring buckets.
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return x, y
+
+    xs = x.astype('int64').astype(float) if np.issubdtype(x.dtype, np.datetime64) else x.astype(float)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    # Average point of every bucket, the last bucket being the last point alone
+    counts = np.diff(np.r_[edges, n])
+    avg_x = np.add.reduceat(xs, edges) / counts
+    avg_y = np.add.reduceat(y, edges) / counts
+
+    keep = np.empty(max_points, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Twice the triangle area of (a, candidate, next bucket average), linear in the candidate
+        dx, dy = xs[a] - avg_x[i + 1], avg_y[i + 1] - y[a]
+        area = np.abs(dx * y[lo:hi] + dy * xs[lo:hi] - dx * y[a] - dy * xs[a])
+        a = lo + area.argmax()
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+def minmax(x, y, max_points):
+    """
+    Keeps the minimum and maximum of max_points/2 equal buckets, so peaks and troughs survive.
+    """
+    n = len(x)
+    if max_points >= n:
+        return x, y
+
+    edges = np.linspace(0, n, max(max_points // 2, 1) + 1).astype(int)
+    keep = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            keep += [lo + np.argmin(y[lo:hi]), lo + np.argmax(y[lo:hi])]
+    keep = np.unique(keep)
+    return x[keep], y[keep]
+
+DOWNSAMPLERS = {
+    'lttb': lttb,
+    'minmax': minmax,
+}
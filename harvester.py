@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from codes import CODES_PATH, CodeTable
+
+COLUMNS_ORDER = [
+    'scheme_code',
+    'shortName',
+    'longName',
+    'symbol',
+    'quoteType',
+    'exchange',
+    'currency',
+    'fundInceptionDate',
+    'totalAssets',
+    'annualHoldingsTurnover',
+    'ytdReturn',
+    'beta3Year',
+    'trailingPE',
+    'annualReportExpenseRatio',
+    'yield',
+    'priceHint',
+    'previousClose',
+    'regularMarketPreviousClose',
+    'fiftyTwoWeekLow',
+    'fiftyTwoWeekHigh',
+    'fiftyDayAverage',
+    'twoHundredDayAverage',
+    'longBusinessSummary',
+    'firstTradeDateEpochUtc',
+    'timeZoneFullName',
+    'timeZoneShortName',
+    'gmtOffSetMilliseconds',
+    'morningStarOverallRating',
+    'morningStarRiskRating',
+    'underlyingSymbol',
+    'trailingPegRatio',
+    'address1',
+    'address2',
+    'address3',
+    'phone',
+    'maxAge',
+    'uuid',
+]
+
+DEFAULT_CHECKPOINT = './data/scheme_details.checkpoint.jsonl'
+DEFAULT_OUTPUT = './data/scheme_details.csv'
+
+
+class RateLimiter:
+    """
+    Spaces calls evenly at `rate` calls per second across all threads.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1/rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Harvester:
+    """
+    Fetches scheme details for many scheme codes with a bounded thread pool, a shared rate limit
+    and retries with exponential backoff. Every fetched scheme is appended to a JSON lines checkpoint,
+    so an interrupted run resumes with only the codes that are still missing.
+    :param fetch: callable scheme_code -> dict, defaults to Mftool.get_scheme_info
+    """
+
+    def __init__(self, fetch=None, checkpoint=DEFAULT_CHECKPOINT, max_workers=8, rate=5,
+                 retries=3, backoff=1.0, log_every=500):
+        self.fetch = fetch if fetch is not None else _mftool_scheme_info
+        self.checkpoint = checkpoint
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.log_every = log_every
+        self.failures = {}
+
+    def harvest(self, scheme_codes):
+        records = self._load_checkpoint()
+        done = {record['schemeCode'] for record in records}
+        pending = [code for code in dict.fromkeys(scheme_codes) if code not in done]
+        print(f'Resuming with {len(done)} fetched, {len(pending)} pending scheme codes')
+
+        self.failures = {}
+        checkpoint_dir = os.path.dirname(self.checkpoint)
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+
+        with open(self.checkpoint, 'a') as f, ThreadPoolExecutor(self.max_workers) as pool:
+            futures = {pool.submit(self._fetch_with_retry, code): code for code in pending}
+            # Results are collected and checkpointed on this thread only
+            for i, future in enumerate(as_completed(futures), 1):
+                code = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    print('Exception while fetching Scheme Code {:s} - {:s}'.format(code, repr(e)))
+                    self.failures[code] = repr(e)
+                    continue
+
+                records.append(record)
+                f.write(json.dumps(record, default=str) + '\n')
+                f.flush()
+
+                if i % self.log_every == 0:
+                    print(f'Fetched {i}/{len(pending)} scheme codes')
+
+        return to_frame(records)
+
+    def _fetch_with_retry(self, scheme_code):
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.wait()
+            try:
+                scheme_details = dict(self.fetch(scheme_code))
+                break
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2**attempt * (1 + random.random()))
+
+        scheme_details['schemeCode'] = scheme_code
+        return scheme_details
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint):
+            return []
+
+        records = []
+        with open(self.checkpoint) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Last line of a run killed mid-write
+                    continue
+        return records
+
+
+_thread_local = threading.local()
+
+
+def _mftool_scheme_info(scheme_code):
+    # One client per thread, Mftool is not known to be thread safe
+    if not hasattr(_thread_local, 'mf'):
+        from packages.mftool import Mftool
+        _thread_local.mf = Mftool()
+    return _thread_local.mf.get_scheme_info(scheme_code, as_json=False)
+
+
+def to_frame(records):
+    df = pd.DataFrame.from_records(records)
+    if len(df) == 0:
+        return pd.DataFrame(columns=COLUMNS_ORDER, index=pd.Index([], name='schemeCode'))
+    df = df.drop_duplicates('schemeCode', keep='last').set_index('schemeCode')
+    return df.reindex(columns=COLUMNS_ORDER)
+
+
+def write(df, path=DEFAULT_OUTPUT):
+    if path.endswith('.parquet'):
+        df.to_parquet(path)
+    else:
+        df.to_csv(path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fetch scheme details for every scheme code in codes.json')
+    parser.add_argument('--codes', default=CODES_PATH)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=5, help='requests per second')
+    parser.add_argument('--sample', type=int, default=None, help='fetch a random sample of codes')
+    parser.add_argument('--shard', default=None, help='fetch only shard i of n, given as i/n')
+    args = parser.parse_args()
+
+    code_table = CodeTable.from_json(args.codes)
+    scheme_codes = code_table.codes
+    if args.shard is not None:
+        index, count = map(int, args.shard.split('/'))
+        scheme_codes = code_table.shard(index, count)
+    if args.sample is not None:
+        scheme_codes = random.sample(scheme_codes, min(args.sample, len(scheme_codes)))
+
+    harvester = Harvester(checkpoint=args.checkpoint, max_workers=args.workers, rate=args.rate)
+    write(harvester.harvest(scheme_codes), args.output)
+    print(f'Wrote {args.output}, {len(harvester.failures)} scheme codes failed')
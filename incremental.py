@@ -0,0 +1,97 @@
+import os
+from urllib.parse import quote
+
+import numpy as np
+
+import cache_files
+import instrumentation
+import rolling_engine
+
+DEFAULT_ROOT = './cache/rolling'
+
+
+class RollingCache:
+    """
+    Persisted rolling return series, one .npz file per (symbol, window, days, sampling_period, kind, match) key.
+    Each file keeps the NAV history a series was computed from with the start index and ratio of every window.
+    When a request only appends dates to that history, only the windows ending on the appended dates are computed.
+    A request whose overlapping NAVs differ from the stored ones (a revised history) is recomputed in full.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+
+    def rolling_ratio(self, key, dates, navs, returns_func, days, match):
+        """
+        :param returns_func: callable (navs, start, ends=None) -> returns, as in rolling_engine
+        :return: np.ndarray of returns aligned with dates
+        """
+        dates = np.asarray(dates).astype('datetime64[ns]')
+        navs = np.asarray(navs, dtype=float)
+
+        entry = self._load(key)
+        if entry is not None:
+            ratio = self._extend(key, entry, dates, navs, returns_func, days, match)
+            if ratio is not None:
+                instrumentation.count('rolling_cache_hits')
+                return ratio
+
+        instrumentation.count('rolling_cache_misses')
+        start = rolling_engine.window_start_indices(dates, days, match)
+        ratio = returns_func(navs, start)
+        instrumentation.count('windows', int((start >= 0).sum()))
+        self._save(key, {'dates': dates, 'navs': navs, 'start': start, 'ratio': ratio})
+        return ratio
+
+    def path(self, key):
+        return os.path.join(self.root, quote('|'.join(map(str, key)), safe='') + '.npz')
+
+    def _extend(self, key, entry, dates, navs, returns_func, days, match):
+        if len(dates) == 0:
+            return None
+
+        # The requested history must line up with the stored one from its first date on
+        offset = np.searchsorted(entry['dates'], dates[0])
+        if offset == len(entry['dates']) or entry['dates'][offset] != dates[0]:
+            return None
+
+        overlap = len(entry['dates']) - offset
+        if len(dates) < overlap:
+            return None
+        if not (np.array_equal(entry['dates'][offset:], dates[:overlap])
+                and np.array_equal(entry['navs'][offset:], navs[:overlap], equal_nan=True)):
+            return None
+
+        if len(dates) > overlap:
+            all_dates = np.concatenate([entry['dates'], dates[overlap:]])
+            all_navs = np.concatenate([entry['navs'], navs[overlap:]])
+            ends = np.arange(len(entry['dates']), len(all_dates))
+            start = rolling_engine.window_start_indices(all_dates, days, match, ends)
+            ratio = returns_func(all_navs, start, ends)
+            instrumentation.count('windows', int((start >= 0).sum()))
+
+            entry = {
+                'dates': all_dates,
+                'navs': all_navs,
+                'start': np.concatenate([entry['start'], start]),
+                'ratio': np.concatenate([entry['ratio'], ratio]),
+            }
+            self._save(key, entry)
+
+        # Windows starting before the requested history would be missing from a full recompute over it
+        ratio = entry['ratio'][offset:].copy()
+        ratio[entry['start'][offset:] < offset] = np.nan
+        return ratio
+
+    def _load(self, key):
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as data:
+            entry = {name: data[name] for name in data.files}
+        entry['dates'] = entry['dates'].astype('datetime64[ns]')
+        return entry
+
+    def _save(self, key, entry):
+        cache_files.write_atomic(self.path(key), lambda f: np.savez(f, **entry))
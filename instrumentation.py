@@ -0,0 +1,113 @@
+import contextlib
+import cProfile
+import io
+import pstats
+import threading
+import time
+from collections import defaultdict
+
+# Stats being collected, None when instrumentation is off. stage() and count() check only this,
+# so instrumented code costs a global lookup and a function call when nothing is collecting.
+_active = None
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class Stats:
+    """
+    Per-stage wall clock timings and counters collected inside instrumentation.collect().
+    Stage timings are inclusive, a stage nested in another is counted in both.
+    """
+
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.profiler = None
+        self._lock = threading.Lock()
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.timings[name] += seconds
+            self.calls[name] += 1
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def as_dict(self):
+        return {
+            'stages': {name: {'calls': self.calls[name], 'seconds': seconds} for name, seconds in self.timings.items()},
+            'counters': dict(self.counters),
+        }
+
+    def report(self):
+        lines = [f"{'stage':<24}{'calls':>8}{'total ms':>12}{'ms/call':>12}"]
+        for name, seconds in sorted(self.timings.items(), key=lambda item: -item[1]):
+            calls = self.calls[name]
+            lines.append(f'{name:<24}{calls:>8}{seconds*1000:>12.2f}{seconds*1000/calls:>12.3f}')
+        if self.counters:
+            lines.append('')
+            lines.append(f"{'counter':<24}{'value':>8}")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'{name:<24}{value:>8}')
+        return '\n'.join(lines)
+
+    def profile_report(self, sort='cumulative', limit=25):
+        if self.profiler is None:
+            return ''
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+class _Stage:
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.stats.add_time(self.name, time.perf_counter() - self.start)
+
+
+def stage(name):
+    stats = _active
+    if stats is None:
+        return _NULL_STAGE
+    return _Stage(stats, name)
+
+
+def count(name, n=1):
+    stats = _active
+    if stats is not None:
+        stats.count(name, n)
+
+
+@contextlib.contextmanager
+def collect(profile=False):
+    """
+    Collects stage timings and counters of everything run inside the block, in all threads.
+    With profile=True a cProfile profiler also runs, see Stats.profile_report.
+
+        with instrumentation.collect() as stats:
+            Measures('NIFTY 50').cagr_rolling_returns('2y', '8y')
+        print(stats.report())
+    """
+    global _active
+    previous = _active
+    stats = Stats()
+    _active = stats
+    if profile:
+        stats.profiler = cProfile.Profile()
+        stats.profiler.enable()
+    try:
+        yield stats
+    finally:
+        if profile:
+            stats.profiler.disable()
+        _active = previous
@@ -0,0 +1,151 @@
+import collections
+import hashlib
+import os
+import pickle
+import threading
+
+import pandas as pd
+
+import cache_files
+import instrumentation
+
+DEFAULT_ROOT = './cache/results'
+
+# Copy-on-Write is always on from pandas 3, where a shallow copy already keeps callers from modifying cached results
+_SHALLOW_COPY = int(pd.__version__.split('.')[0]) >= 3
+
+
+class ResultCache:
+    """
+    Bounded LRU of Measures results in memory, optionally backed by one pickle per result on disk.
+    Keys carry the version of the NAV a result was computed from, so a changed NAV never hits an old
+    result, which just ages out of the LRU. Results are handed out as copies, callers may modify them.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=256 << 20, root=None, max_disk_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.root = root
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :return: a copy of the result stored under key, None when there is none
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is not None:
+            instrumentation.count('memo_hits')
+            return _copy(entry[0])
+
+        value = self._read(key) if self.root is not None else None
+        if value is not None:
+            with self._lock:
+                self.disk_hits += 1
+            instrumentation.count('memo_disk_hits')
+            self._remember(key, value)
+            return _copy(value)
+
+        with self._lock:
+            self.misses += 1
+        instrumentation.count('memo_misses')
+        return None
+
+    def put(self, key, value):
+        self._remember(key, _copy(value))
+        if self.root is not None:
+            self._write(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'diskHits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def path(self, key):
+        return os.path.join(self.root, hashlib.sha1(repr(key).encode()).hexdigest() + '.pkl')
+
+    def _remember(self, key, value):
+        size = _size(value)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            # Least recently used first, the entry just added is always kept
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+                instrumentation.count('memo_evictions')
+
+    def _read(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                stored_key, value = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated, or pickled under other pandas or numpy versions, e.g. an AttributeError or ModuleNotFoundError
+            _remove(path)
+            return None
+        # Guards against a hash collision, the file must hold this very key
+        if stored_key != key:
+            return None
+        os.utime(path)
+        return value
+
+    def _write(self, key, value):
+        path = self.path(key)
+        cache_files.write_atomic(path, lambda f: pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL))
+        if self.max_disk_bytes is not None:
+            self._evict_disk(keep=path)
+
+    def _evict_disk(self, keep):
+        cache_files.evict_lru(self.root, '.pkl', self.max_disk_bytes, keep)
+
+
+def _copy(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=not _SHALLOW_COPY)
+    if isinstance(value, tuple):
+        return tuple(_copy(item) for item in value)
+    return value
+
+
+def _size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    if isinstance(value, tuple):
+        return sum(_size(item) for item in value)
+    return 0
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,240 @@
+import datetime
+import os
+import threading
+import time
+import zlib
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+
+import cache_files
+import data_sources
+import instrumentation
+
+DEFAULT_ROOT = './cache/nav'
+
+
+class NavStore:
+    """
+    On-disk NAV history keyed by symbol, one columnar .npz file (dates, navs) per symbol.
+    Only the date ranges missing from the cache are downloaded. The tail of a series is refreshed
+    once it is older than max_age, and least recently used symbols are evicted beyond max_bytes.
+    The downloader is any callable (symbol, start, end) -> DataFrame with 'date' and 'nav' columns,
+    where end is exclusive as in yf.download, or a data_sources.DataSource.
+    With keep_loaded, histories stay in memory once read and are served from there until their file changes.
+    A store can be shared between threads, the history of a symbol is filled by one thread at a time.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, downloader=data_sources.YFinanceSource(),
+                 max_age=datetime.timedelta(hours=12), max_bytes=None, offline=False, keep_loaded=False):
+        self.root = root
+        self.downloader = downloader
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.keep_loaded = keep_loaded
+        # symbol -> (inode, fetched_at, version) of the histories this store loaded or saved
+        self._versions = {}
+        # symbol -> (inode, entry) of the histories kept in memory
+        self._loaded = {}
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def get(self, symbol, start, end):
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        with self._lock(symbol):
+            entry = self._load(symbol)
+            if not self.offline:
+                entry = self._fill(symbol, entry, start, end)
+
+        if entry is None:
+            return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'), 'nav': pd.Series(dtype=float)})
+
+        dates = entry['dates']
+        lo = np.searchsorted(dates, start.to_datetime64(), side='left')
+        hi = np.searchsorted(dates, end.to_datetime64(), side='left')
+        return pd.DataFrame({'date': dates[lo:hi], 'nav': entry['navs'][lo:hi]})
+
+    def version(self, symbol):
+        """
+        (last NAV date, digest of the NAVs) of the cached history of symbol, checked with a single stat call.
+        None when this store has not read the history yet, the file was rewritten since, or get would refresh it.
+        """
+        known = self._versions.get(symbol)
+        if known is None:
+            return None
+        try:
+            inode = os.stat(self.path(symbol)).st_ino
+        except FileNotFoundError:
+            return None
+
+        inode_seen, fetched_at, version = known
+        stale = not self.offline and time.time() - fetched_at > self.max_age.total_seconds()
+        if inode != inode_seen or stale:
+            return None
+        return version
+
+    def symbols(self):
+        # Symbols with a cached history
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(unquote(name[:-len('.npz')]) for name in os.listdir(self.root) if name.endswith('.npz'))
+
+    def path(self, symbol):
+        return os.path.join(self.root, quote(symbol, safe='') + '.npz')
+
+    def refresh(self, symbols, start, end):
+        """
+        Brings many symbols up to date at once. The missing ranges of every symbol are fetched in one
+        downloader.fetch_many call, concurrently when the downloader is a data_sources.HttpSource.
+        :return: dict of symbol -> exception for symbols that could not be refreshed, their cache is left as it was
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        now = time.time()
+        entries = {symbol: self._load(symbol) for symbol in dict.fromkeys(symbols)}
+        ranges = {symbol: self._missing(entry, start, end, now) for symbol, entry in entries.items()}
+
+        requests = [(symbol, str(lo.date()), str(hi.date())) for symbol in ranges for lo, hi in ranges[symbol]]
+        instrumentation.count('nav_downloads', len(requests))
+        with instrumentation.stage('download'):
+            result = data_sources.as_source(self.downloader).fetch_many(requests)
+
+        failures = {}
+        for symbol, entry in entries.items():
+            if not ranges[symbol]:
+                instrumentation.count('nav_cache_hits')
+                continue
+            instrumentation.count('nav_cache_misses')
+
+            keys = [(symbol, str(lo.date()), str(hi.date())) for lo, hi in ranges[symbol]]
+            failed = [result.failures[key] for key in keys if key in result.failures]
+            if failed:
+                failures[symbol] = failed[0]
+                continue
+            frames = [self._normalize(result.navs[key]) for key in keys]
+            with self._lock(symbol):
+                # Another thread may have saved the history while it was being downloaded
+                current = self._load(symbol)
+                self._merge(symbol, current if current is not None else entry, ranges[symbol], frames, start, end, now)
+        return failures
+
+    def _lock(self, symbol):
+        with self._locks_lock:
+            return self._locks.setdefault(symbol, threading.Lock())
+
+    def _fill(self, symbol, entry, start, end):
+        now = time.time()
+        ranges = self._missing(entry, start, end, now)
+        if not ranges:
+            instrumentation.count('nav_cache_hits')
+            return entry
+
+        instrumentation.count('nav_cache_misses')
+        frames = [self._download(symbol, lo, hi) for lo, hi in ranges]
+        return self._merge(symbol, entry, ranges, frames, start, end, now)
+
+    def _missing(self, entry, start, end, now):
+        """
+        :return: list of (start, end) ranges to download for entry to cover [start, end) and be fresh
+        """
+        if entry is None:
+            return [(start, end)]
+
+        covered_start = pd.Timestamp(entry['covered_start'])
+        covered_end = pd.Timestamp(entry['covered_end'])
+        ranges = []
+        if start < covered_start:
+            ranges.append((start, covered_start))
+
+        # A stale series re-fetches from its last stored date, to pick up late or revised NAVs
+        stale = now - float(entry['fetched_at']) > self.max_age.total_seconds()
+        tail_start = covered_end
+        if stale and len(entry['dates']) > 0:
+            tail_start = min(covered_end, pd.Timestamp(entry['dates'][-1]))
+        if tail_start < end and (end > covered_end or stale):
+            ranges.append((tail_start, end))
+        return ranges
+
+    def _merge(self, symbol, entry, ranges, frames, start, end, now):
+        if entry is None:
+            return self._save(symbol, frames[0], start, end, now)
+
+        covered_start = pd.Timestamp(entry['covered_start'])
+        covered_end = pd.Timestamp(entry['covered_end'])
+        fetched_at = float(entry['fetched_at'])
+        # Only the tail range starts inside the covered range, fetching it makes the series fresh
+        if any(lo >= covered_start for lo, _ in ranges):
+            fetched_at = now
+
+        # Later frames are newer downloads and win over cached values for the same date
+        frames = [pd.DataFrame({'date': entry['dates'], 'nav': entry['navs']})] + frames
+        nav_df = pd.concat(frames).drop_duplicates('date', keep='last')
+        return self._save(symbol, nav_df, min(start, covered_start), max(end, covered_end), fetched_at)
+
+    def _download(self, symbol, start, end):
+        instrumentation.count('nav_downloads')
+        with instrumentation.stage('download'):
+            nav_df = self.downloader(symbol, str(start.date()), str(end.date()))
+        return self._normalize(nav_df)
+
+    @staticmethod
+    def _normalize(nav_df):
+        dates = pd.to_datetime(nav_df['date'], cache=False)
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        return pd.DataFrame({'date': dates.to_numpy(dtype='datetime64[ns]'), 'nav': nav_df['nav'].to_numpy(dtype=float)})
+
+    def _load(self, symbol):
+        path = self.path(symbol)
+        if not os.path.exists(path):
+            return None
+
+        kept = self._loaded.get(symbol)
+        if kept is not None and os.stat(path).st_ino == kept[0]:
+            instrumentation.count('nav_memory_hits')
+            # A history read from memory is still recently used
+            os.utime(path)
+            return kept[1]
+
+        try:
+            with instrumentation.stage('nav_load'), np.load(path) as data:
+                entry = {key: data[key][()] for key in data.files}
+            entry['dates'] = entry['dates'].astype('datetime64[ns]')
+            # Access time is tracked on the file itself for LRU eviction
+            os.utime(path)
+            self._remember_version(symbol, entry)
+        except FileNotFoundError:
+            # Evicted while saving another symbol
+            return None
+        return entry
+
+    def _save(self, symbol, nav_df, covered_start, covered_end, fetched_at):
+        nav_df = nav_df.dropna().sort_values('date')
+        entry = {
+            'dates': nav_df['date'].to_numpy(dtype='datetime64[ns]'),
+            'navs': nav_df['nav'].to_numpy(dtype=float),
+            'covered_start': np.datetime64(covered_start, 'ns'),
+            'covered_end': np.datetime64(covered_end, 'ns'),
+            'fetched_at': np.float64(fetched_at),
+        }
+
+        path = self.path(symbol)
+        cache_files.write_atomic(path, lambda f: np.savez(f, **entry))
+        self._remember_version(symbol, entry)
+
+        if self.max_bytes is not None:
+            self._evict(keep=path)
+        return entry
+
+    def _remember_version(self, symbol, entry):
+        inode = os.stat(self.path(symbol)).st_ino
+        last = entry['dates'][-1] if len(entry['dates']) else None
+        version = (str(last), zlib.crc32(entry['navs'].tobytes()))
+        self._versions[symbol] = (inode, float(entry['fetched_at']), version)
+        if self.keep_loaded:
+            self._loaded[symbol] = (inode, entry)
+
+    def _evict(self, keep):
+        for path in cache_files.evict_lru(self.root, '.npz', self.max_bytes, keep):
+            self._loaded.pop(unquote(os.path.basename(path)[:-len('.npz')]), None)
@@ -0,0 +1,133 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import cache_files
+
+DEFAULT_PATH = './cache/nav_panel.bin'
+
+MAGIC = b'NAVPANEL'
+VERSION = 1
+# Arrays start on page boundaries so every symbol row maps to whole pages
+ALIGNMENT = 4096
+
+
+class PanelSnapshot:
+    """
+    Read-only view of a NAV panel snapshot file, memory-mapped so that every process opening the same
+    file shares one page cache copy and nothing is read until it is sliced.
+    The file holds a JSON header (dtype, shape, symbol table, covered range), the int64 nanosecond dates
+    and the NAVs stored symbols x dates, so the history of one symbol is a contiguous run of pages.
+    """
+
+    def __init__(self, path, header, dates, values):
+        self.path = path
+        self.header = header
+        self.symbols = header['symbols']
+        self.dates = dates
+        # symbols x dates as stored, see navs for the dates x symbols view
+        self.values = values
+        self._index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        # Range the NAVs were exported for, [start, end) as in NavStore.get, else the span of its dates
+        self.start = pd.Timestamp(header['start']) if header.get('start') else pd.Timestamp(dates[0])
+        self.end = pd.Timestamp(header['end']) if header.get('end') else pd.Timestamp(dates[-1]) + pd.Timedelta(days=1)
+        # A snapshot file is never modified in place, a new one replaces it with a new inode
+        stat = os.stat(path)
+        self.version = (os.path.abspath(path), stat.st_ino, stat.st_size)
+
+    @classmethod
+    def open(cls, path=DEFAULT_PATH):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a NAV panel snapshot')
+            header_size = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_size))
+        if header.get('version') != VERSION:
+            raise ValueError(f"{path} is a version {header.get('version')} NAV panel snapshot, expected version {VERSION}")
+
+        n_dates, n_symbols = header['n_dates'], len(header['symbols'])
+        dates = np.memmap(path, dtype='<i8', mode='r', offset=header['dates_offset'], shape=(n_dates,))
+        values = np.memmap(path, dtype=header['dtype'], mode='r', offset=header['navs_offset'], shape=(n_symbols, n_dates))
+        return cls(path, header, dates.view('datetime64[ns]'), values)
+
+    @property
+    def navs(self):
+        # dates x symbols, as Universe.panel, without a copy
+        return self.values.T
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._index
+
+    def covers(self, start, end=None):
+        # Whether the snapshot was exported for a range holding [start, end)
+        return self.start <= pd.Timestamp(start) and (end is None or pd.Timestamp(end) <= self.end)
+
+    def last_date(self, symbol):
+        # Date of the last NAV of symbol, NaT when it has none
+        valid = np.flatnonzero(~np.isnan(self.values[self._index[symbol]]))
+        return pd.Timestamp(self.dates[valid[-1]]) if len(valid) else pd.NaT
+
+    def series(self, symbol, start=None, end=None):
+        """
+        :return: (dates, navs) views of a symbol's history for start <= date < end, NaN where it has no NAV
+        """
+        row = self._index[symbol]
+        lo = 0 if start is None else np.searchsorted(self.dates, pd.Timestamp(start).to_datetime64(), side='left')
+        hi = len(self.dates) if end is None else np.searchsorted(self.dates, pd.Timestamp(end).to_datetime64(), side='left')
+        return self.dates[lo:hi], self.values[row, lo:hi]
+
+    def get(self, symbol, start, end):
+        """
+        Same contract as NavStore.get: a DataFrame with 'date' and 'nav' columns for start <= date < end.
+        """
+        dates, navs = self.series(symbol, start, end)
+        valid = ~np.isnan(navs)
+        return pd.DataFrame({'date': dates[valid], 'nav': navs[valid].astype(float)})
+
+
+def write(path, dates, symbols, navs, dtype='float64', start=None, end=None):
+    """
+    Function to write a NAV panel snapshot. The file is replaced atomically, processes that already
+    mapped the previous snapshot keep reading it until they open the new one.
+    :param dates: sorted array of datetime64 dates
+    :param symbols: list of symbols, one per panel column
+    :param navs: dates x symbols np.ndarray with NaN where a symbol has no NAV
+    :param dtype: 'float64' or 'float32', float32 halves the file for ~7 significant digits
+    :param start: start of the range the NAVs were read for, defaults to the first date
+    :param end: exclusive end of that range, defaults to the day after the last date
+    """
+    dates = np.asarray(dates).astype('datetime64[ns]')
+    values = np.ascontiguousarray(np.asarray(navs, dtype=dtype).T)
+    symbols = [str(symbol) for symbol in symbols]
+    if values.shape != (len(symbols), len(dates)):
+        raise ValueError(f'navs of shape {navs.shape} do not match {len(dates)} dates x {len(symbols)} symbols')
+
+    header = {'version': VERSION, 'dtype': np.dtype(dtype).str, 'n_dates': len(dates), 'symbols': symbols,
+              'start': None if start is None else str(pd.Timestamp(start)),
+              'end': None if end is None else str(pd.Timestamp(end))}
+    # Offsets depend on the header size, which depends on the offsets' digits, so reserve room for them
+    header.update(dates_offset=0, navs_offset=0)
+    base = len(MAGIC) + 8 + len(json.dumps(header).encode()) + 64
+    header['dates_offset'] = _align(base)
+    header['navs_offset'] = _align(header['dates_offset'] + dates.nbytes)
+    encoded = json.dumps(header).encode()
+
+    def write_file(f):
+        f.write(MAGIC)
+        f.write(len(encoded).to_bytes(8, 'little'))
+        f.write(encoded)
+        f.write(b'\0' * (header['dates_offset'] - f.tell()))
+        dates.view('<i8').tofile(f)
+        f.write(b'\0' * (header['navs_offset'] - f.tell()))
+        values.tofile(f)
+
+    cache_files.write_atomic(path, write_file)
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
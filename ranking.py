@@ -0,0 +1,110 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+def rank_panel(returns):
+    """
+    Function to rank funds against each other on every date of a dates x funds returns panel.
+    Ties get their average rank and NaN (no return on that date) is left out, like DataFrame.rank(axis=1, pct=True).
+    :param returns: dates x funds np.ndarray or pd.DataFrame
+    :return: (percentile, quartile) np.ndarrays, percentile 1.0 and quartile 1 being the best fund of the date
+    """
+    values = np.asarray(returns, dtype=float)
+    n_funds = values.shape[1]
+    valid = ~np.isnan(values)
+    n_valid = valid.sum(axis=1, keepdims=True)
+
+    # NaN sorts last, so valid returns take the first n_valid positions of every sorted row
+    order = np.argsort(values, axis=1, kind='stable')
+    ordered = np.take_along_axis(values, order, axis=1)
+    positions = np.broadcast_to(np.arange(n_funds), values.shape)
+
+    # Average rank of a run of equal values is the mean of its first and last positions
+    run_start = np.ones(values.shape, dtype=bool)
+    run_start[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    run_end = np.ones(values.shape, dtype=bool)
+    run_end[:, :-1] = run_start[:, 1:]
+    first = np.maximum.accumulate(np.where(run_start, positions, 0), axis=1)
+    last = np.minimum.accumulate(np.where(run_end, positions, n_funds - 1)[:, ::-1], axis=1)[:, ::-1]
+
+    ranks = np.empty(values.shape)
+    np.put_along_axis(ranks, order, (first + last) / 2 + 1, axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        percentile = np.where(valid, ranks / n_valid, np.nan)
+        # Position from the top, 0 for the best return of the date, so the best fund is in quartile 1
+        # even when fewer than 4 funds have a return
+        quartile = np.where(valid, np.floor((n_valid - ranks) / n_valid * 4) + 1, np.nan)
+    return percentile, quartile
+
+
+def consistency(quartile):
+    """
+    Share of each fund's dates on which it was in the top quartile.
+    """
+    quartile = np.asarray(quartile, dtype=float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (quartile == 1).sum(axis=0) / (~np.isnan(quartile)).sum(axis=0)
+
+
+def rank_category(returns):
+    """
+    :param returns: wide dates x schemeName frame of rolling returns of one category
+    :return: (ranks, consistency) where ranks is a long frame of date, schemeName, ratio, percentile and quartile
+    and consistency has the topQuartileShare and number of windows of every fund
+    """
+    values = returns.to_numpy(dtype=float)
+    percentile, quartile = rank_panel(values)
+
+    cols, rows = np.nonzero(~np.isnan(values.T))
+    schemes = returns.columns.to_numpy()
+    ranks = pd.DataFrame({
+        'schemeName': schemes[cols],
+        'date': returns.index.to_numpy()[rows],
+        'ratio': values[rows, cols],
+        'percentile': percentile[rows, cols],
+        'quartile': quartile[rows, cols].astype(int),
+    })
+    scores = pd.DataFrame({
+        'schemeName': schemes,
+        'topQuartileShare': consistency(quartile),
+        'windows': (~np.isnan(values)).sum(axis=0),
+    })
+    return ranks, scores
+
+
+def _rank_category(item):
+    category, returns = item
+    ranks, scores = rank_category(returns)
+    ranks.insert(0, 'category', category)
+    scores.insert(0, 'category', category)
+    return ranks, scores
+
+
+def rank_categories(rolling, exclude=('Index Fund',), processes=None):
+    """
+    Ranks every fund against the funds of its own category, on every date.
+    :param rolling: long rolling returns frame with category, schemeName, date and ratio columns,
+    e.g. Universe.rolling_returns or several Measures results concatenated
+    :param exclude: categories not ranked, benchmarks resolve to 'Index Fund'
+    :param processes: rank categories in a pool of this many processes, in this process when None
+    :return: (ranks, consistency) frames over all categories
+    """
+    rolling = rolling[~rolling['category'].isin(exclude)]
+    items = [
+        (category, group.pivot_table(index='date', columns='schemeName', values='ratio', aggfunc='last'))
+        for category, group in rolling.groupby('category', sort=True)
+    ]
+
+    if processes is None:
+        results = [_rank_category(item) for item in items]
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            results = list(pool.map(_rank_category, items))
+
+    if not results:
+        return pd.DataFrame(), pd.DataFrame()
+    ranks, scores = zip(*results)
+    return pd.concat(ranks, ignore_index=True), pd.concat(scores, ignore_index=True)
@@ -1,18 +1,40 @@
 import pandas as pd
+import os
 import re
 import datetime
-import yfinance as yf
+import functools
+import inspect
+import threading
 import numpy as np
 from dateutil.relativedelta import relativedelta
 from datetime import timedelta
-from packages.mftool import Mftool
 
-print("Loading schemes and eq_schemes")
-
-schemes = pd.read_csv('./data/scheme_details.csv')
-eq_schemes = pd.read_csv('./data/equity_schemes.csv')
-
-mf = Mftool()
+import instrumentation
+import panel_snapshot
+import reference_data
+import relative
+import risk
+import rolling_engine
+import search
+import sip
+from codes import ALL_CODES_PATH, CODES_PATH
+from incremental import RollingCache
+from memo import ResultCache
+from nav_store import NavStore
+from resolver import SchemeResolver
+from search import SchemeIndex
+
+# schemes, eq_schemes, their resolver and the Mftool client are only loaded on first use,
+# so importing ratios stays cheap for callers that never touch them
+_lazy = {}
+_lazy_lock = threading.Lock()
+
+nav_store = NavStore()
+rolling_cache = RollingCache()
+# Shared read-only NAV snapshot SchemeDetails.get_nav slices from when set, see use_nav_panel
+nav_panel = None
+# Memoized Measures results, e.g. ResultCache(root=memo.DEFAULT_ROOT) to also keep them on disk, None to turn off
+result_cache = ResultCache()
 
 COLUMNS = ['schemeCode', 'schemeName', 'category', 'benchmark', 'symbol', 'shortName', 'longName']
 
@@ -24,60 +46,249 @@ YFINANCE_INDEX_CODES = {
     'S&P BSE 250 Large MidCap': 'LMI250.BO',
 }
 
+def get_schemes():
+    return _load_reference_data()['schemes']
+
+def get_eq_schemes():
+    return _load_reference_data()['eq_schemes']
+
+def get_resolver():
+    return _load_reference_data()['resolver']
+
+def get_mf():
+    if 'mf' not in _lazy:
+        with _lazy_lock:
+            if 'mf' not in _lazy:
+                from packages.mftool import Mftool
+                _lazy['mf'] = Mftool()
+    return _lazy['mf']
+
+def _load_reference_data():
+    if 'resolver' not in _lazy:
+        with _lazy_lock:
+            if 'resolver' not in _lazy:
+                print("Loading schemes and eq_schemes")
+                schemes = reference_data.load(reference_data.SCHEMES_PATH)
+                eq_schemes = reference_data.load(reference_data.EQ_SCHEMES_PATH)
+                _lazy['schemes'] = schemes
+                _lazy['eq_schemes'] = eq_schemes
+                _lazy['resolver'] = SchemeResolver(schemes, eq_schemes)
+    return _lazy
+
+def set_reference_data(schemes, eq_schemes, mf = None):
+    # Replaces the lazily loaded reference data, e.g. with synthetic schemes for offline runs
+    with _lazy_lock:
+        _lazy['schemes'] = schemes
+        _lazy['eq_schemes'] = eq_schemes
+        _lazy['resolver'] = SchemeResolver(schemes, eq_schemes)
+        _lazy.pop('scheme_index', None)
+        _lazy.pop('fund_index', None)
+        if mf is not None:
+            _lazy['mf'] = mf
+
+def get_scheme_index():
+    # Search index over the names of every scheme code in codes.json, scheme_codes_all.json and scheme_details.csv
+    if 'scheme_index' not in _lazy:
+        schemes = get_schemes()
+        codes_path = CODES_PATH if os.path.exists(CODES_PATH) else None
+        all_codes_path = ALL_CODES_PATH if os.path.exists(ALL_CODES_PATH) else None
+        with _lazy_lock:
+            if 'scheme_index' not in _lazy:
+                _lazy['scheme_index'] = SchemeIndex.from_sources(codes_path, schemes, all_codes_path)
+    return _lazy['scheme_index']
+
+def get_fund_index():
+    # Search index over the fund names of equity_schemes.csv, the names SchemeDetails resolves
+    if 'fund_index' not in _lazy:
+        names = get_eq_schemes()['scheme_name']
+        with _lazy_lock:
+            if 'fund_index' not in _lazy:
+                _lazy['fund_index'] = SchemeIndex(zip(names, names))
+    return _lazy['fund_index']
+
+def find_schemes(query, k = 10, plan = None, option = None):
+    """
+    Function to search scheme names, e.g. find_schemes('axis bluechip', plan='direct', option='growth').
+    Tolerates typos and abbreviations, and is fast enough to call on every keystroke.
+    :return: DataFrame of the k best matches with schemeCode, name, plan, option and score columns
+    """
+    matches = get_scheme_index().search(query, k, plan, option)
+    return pd.DataFrame(matches, columns=['schemeCode', 'name', 'plan', 'option', 'score'])
+
+def suggest_funds(fund, k = 5):
+    # Fund names SchemeDetails resolves that are closest to fund
+    return [match['schemeCode'] for match in get_fund_index().search(fund, k)]
+
+def export_nav_panel(path = panel_snapshot.DEFAULT_PATH, symbols = None, period = '15y', dtype = 'float64'):
+    """
+    Writes the dates x symbols NAV matrix of symbols over period to a memory-mapped snapshot file,
+    every symbol cached in the NAV store by default. Open it in each kernel or worker with use_nav_panel.
+    """
+    from universe import align_navs
+
+    if symbols is None:
+        symbols = nav_store.symbols()
+    start_date, end_date = str(convert_period_to_date(period)), str(datetime.date.today())
+    dates, navs = align_navs([nav_store.get(symbol, start_date, end_date) for symbol in symbols])
+    panel_snapshot.write(path, dates, symbols, navs, dtype, start_date, end_date)
+    return path
+
+def use_nav_panel(path = panel_snapshot.DEFAULT_PATH):
+    # Maps a snapshot read-only, SchemeDetails.get_nav then slices the symbols it holds from it. None stops using it
+    global nav_panel
+    nav_panel = None if path is None else panel_snapshot.PanelSnapshot.open(path)
+    return nav_panel
+
+def nav_version(symbol):
+    # Version of the NAV history get_nav would read for symbol, None when it cannot be told without reading it
+    if nav_panel is not None and symbol in nav_panel:
+        # The store's version too, get_nav reads from it when the snapshot does not cover a period
+        return nav_panel.version, nav_store.version(symbol)
+    return nav_store.version(symbol)
+
+def _panel_serves(symbol, start_date, end_date):
+    # The snapshot holds all of [start_date, end_date) of symbol, or all the store has of it so far
+    if nav_panel is None or symbol not in nav_panel or not nav_panel.covers(start_date):
+        return False
+    if nav_panel.covers(start_date, end_date):
+        return True
+    version = nav_store.version(symbol)
+    if version is None:
+        return False
+    # The store's version starts with the date of its last NAV, 'None' when it has none
+    return version[0] == 'None' or pd.Timestamp(version[0]) <= nav_panel.last_date(symbol)
+
+def _memoized(method):
+    # Serves repeated Measures calls from result_cache, keyed on their arguments and the version of the NAV they read
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if result_cache is None:
+            return method(self, *args, **kwargs)
+
+        arguments = signature.bind(self, *args, **kwargs)
+        arguments.apply_defaults()
+        params = tuple((name, tuple(value) if isinstance(value, list) else value)
+                       for name, value in arguments.arguments.items() if name != 'self')
+        symbol = self.scheme_details.symbol
+
+        def key(version):
+            # Periods are counted back from today, so the day is part of the key
+            return (symbol, method.__name__, params, str(datetime.date.today()), version)
+
+        version = nav_version(symbol)
+        if version is not None:
+            result = result_cache.get(key(version))
+            if result is not None:
+                return result
+
+        result = method(self, *args, **kwargs)
+        version = nav_version(symbol)
+        if version is not None:
+            result_cache.put(key(version), result)
+        return result
+    return wrapper
+
+def __getattr__(name):
+    # Keeps ratios.schemes, ratios.eq_schemes, ratios.resolver and ratios.mf working, loaded on first access
+    if name in ('schemes', 'eq_schemes', 'resolver'):
+        return _load_reference_data()[name]
+    if name == 'mf':
+        return get_mf()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 class Measures:
     def __init__(self, fund):
         self.fund = fund
         self.scheme_details = SchemeDetails(fund)
 
-    def rolling_returns(self, window, period = '15y', sampling_period = '1d'):
-        days = convert_period_to_days(window)
-        
-        def absolute(x):
-            x = x.reset_index()
-            first = x.iloc[0]
-            last = x.iloc[-1]
-            # 1 is subtracted from days as window has one day less
-            if first['date'] != subtract_days(last['date'], days-1):
-                return np.nan
-
-            # nav is in column 0
-            return last[0]/first[0] - 1
-
-        return self._rolling_returns(absolute, window, period, sampling_period)
+    @_memoized
+    def rolling_returns(self, window, period = '15y', sampling_period = '1d', match = 'exact', incremental = False):
+        return self._rolling_returns('absolute', rolling_engine.absolute_returns, window, period, sampling_period, match, incremental)
 
-    def cagr_rolling_returns(self, window, period = '15y', sampling_period = '1d'):
+    @_memoized
+    def cagr_rolling_returns(self, window, period = '15y', sampling_period = '1d', match = 'exact', incremental = False):
         days = convert_period_to_days(window)
         if days <= 365:
-            return self.rolling_returns(self, window, period, sampling_period)
+            return self.rolling_returns(window, period, sampling_period, match, incremental)
 
         years = int(days/365)
-        
-        def cagr(x):
-            x = x.reset_index()
-            first = x.iloc[0]
-            last = x.iloc[-1]
-            # 1 is subtracted from days as window has one day less
-            if first['date'] != subtract_days(last['date'], days-1):
-                return np.nan
 
-            # nav is in column 0
-            return (last[0]/first[0])**(1/years) - 1
+        def cagr(navs, start, ends = None):
+            return rolling_engine.cagr_returns(navs, start, years, ends)
 
-        return self._rolling_returns(cagr, window, period, sampling_period)
+        return self._rolling_returns(f'cagr{years}', cagr, window, period, sampling_period, match, incremental)
 
-    def _rolling_returns(self, lambda_func, window, period = '15y', sampling_period = '1d'):
+    @_memoized
+    def multi_window_returns(self, windows = ('1y', '3y', '5y', '7y', '10y'), period = '15y', sampling_period = '1d', match = 'exact'):
+        """
+        CAGR rolling returns of several windows side by side, as cagr_rolling_returns would give for each window.
+        The NAV is loaded, sampled and log transformed once, every window is then a binary search and a subtraction.
+        :return: (returns, summary) where returns has date, nav and one column per window, and summary
+        has the min, median, max, share of negative windows in percent and number of windows per window
+        """
+        nav = self.scheme_details.get_nav(period)
+        if sampling_period != '1d':
+            with instrumentation.stage('resample'):
+                nav = nav.resample(sampling_period, on='date').last().reset_index()
+        nav = nav.dropna()
+
+        returns = nav.reset_index(drop=True)
+        with instrumentation.stage('rolling'):
+            dates = returns['date'].values
+            log_navs = np.log(returns['nav'].to_numpy(dtype=float))
+            for window in windows:
+                days = convert_period_to_days(window)
+                years = int(days/365) if days > 365 else 1
+                start = rolling_engine.window_start_indices(dates, days, match)
+                returns[window] = rolling_engine.log_returns(log_navs, start, years)
+                instrumentation.count('windows', int((start >= 0).sum()))
+        instrumentation.count('rows', len(returns))
+
+        returns = returns.dropna(how = 'all', subset = list(windows)).reset_index(drop=True)
+        window_returns = returns[list(windows)]
+        summary = pd.DataFrame({
+            'min': window_returns.min(),
+            'median': window_returns.median(),
+            'max': window_returns.max(),
+            'percentNegative': (window_returns < 0).sum() / window_returns.count() * 100,
+            'windows': window_returns.count(),
+        }).rename_axis('window')
+
+        with instrumentation.stage('populate'):
+            return self._populate_df_with_scheme_details(returns), summary
+
+    def _rolling_returns(self, kind, returns_func, window, period = '15y', sampling_period = '1d', match = 'exact', incremental = False):
         nav = self.scheme_details.get_nav(period)
         days = convert_period_to_days(window)
 
         if sampling_period == '1d':
             rolling = nav
         else:
-            rolling = nav.resample(sampling_period, on='date').last()
+            with instrumentation.stage('resample'):
+                rolling = nav.resample(sampling_period, on='date').last().reset_index()
+
+        with instrumentation.stage('rolling'):
+            dates, navs = rolling['date'].values, rolling['nav'].to_numpy(dtype=float)
+            if incremental:
+                # Only windows ending on dates appended since the last call are computed. The days of a window
+                # depend on today's date, e.g. '1y' spanning a 29 February, so they are part of the key
+                key = (self.scheme_details.symbol, window, days, sampling_period, kind, match)
+                rolling['ratio'] = rolling_cache.rolling_ratio(key, dates, navs, returns_func, days, match)
+            else:
+                # Start of every window is found with a binary search on the dates,
+                # so all windows are evaluated in a single array operation
+                start = rolling_engine.window_start_indices(dates, days, match)
+                rolling['ratio'] = returns_func(navs, start)
+                instrumentation.count('windows', int((start >= 0).sum()))
+        instrumentation.count('rows', len(rolling))
 
-        rolling['ratio'] = rolling.rolling(window=str(days)+'d', on='date')['nav'].apply(lambda x: lambda_func(x))
-        rolling['percentage'] = rolling['ratio'].apply(lambda x: f'{x:.2%}')
         rolling = rolling.dropna()
-        return self._populate_df_with_scheme_details(rolling)
+
+        with instrumentation.stage('populate'):
+            return self._populate_df_with_scheme_details(rolling)
 
     # To
     def _populate_df_with_scheme_details(self, df):
@@ -88,6 +299,91 @@ class Measures:
         # df.insert(4, 'benchmark', scheme_detail['benchmark'].iloc[0])
         return df
     
+    def relative_statistics(self, period = '15y', sampling_period = '1d', benchmark = None):
+        """
+        Upside/downside capture, beta, alpha, tracking error and information ratio against
+        the fund's benchmark (or the given one) over the full period.
+        """
+        returns = self._returns_against_benchmark(period, sampling_period, benchmark)
+        fund, index = returns['fund'].to_numpy(), returns['benchmark'].to_numpy()
+        ppy = rolling_engine.periods_per_year(returns['date'].values)
+
+        stats = relative.relative_statistics(fund, index, np.zeros(len(returns), dtype=int), ppy)
+        return pd.Series({name: values[-1] for name, values in stats.items()})
+
+    def rolling_relative_statistics(self, window, period = '15y', sampling_period = '1d', benchmark = None):
+        returns = self._returns_against_benchmark(period, sampling_period, benchmark)
+        days = convert_period_to_days(window)
+        dates = returns['date'].values
+        ppy = rolling_engine.periods_per_year(dates)
+
+        with instrumentation.stage('relative'):
+            start = rolling_engine.trailing_start_indices(dates, days)
+            stats = relative.relative_statistics(returns['fund'].to_numpy(), returns['benchmark'].to_numpy(), start, ppy)
+
+        rolling = pd.DataFrame({'date': returns['date'], **stats})
+        # Only windows fully covered by the returns history
+        rolling = rolling[dates - np.timedelta64(days, 'D') >= dates[0]]
+        rolling = rolling.dropna()
+        return self._populate_df_with_scheme_details(rolling)
+
+    @_memoized
+    def rolling_sip_returns(self, window, period = '15y', amount = 1.0):
+        """
+        Outcome of a monthly SIP of the given length started on every date, with its XIRR.
+        All start dates are solved together, see sip.rolling_sip.
+        :param window: SIP length in months or years, e.g. '3y'
+        :return: pd.DataFrame with the start date, amount invested, final value, absoluteReturn and xirr
+        """
+        nav = self.scheme_details.get_nav(period).dropna()
+        months = convert_period_to_months(window)
+
+        with instrumentation.stage('sip'):
+            stats = sip.rolling_sip(nav['date'].values, nav['nav'].to_numpy(dtype=float), months, amount)
+        instrumentation.count('windows', int((~np.isnan(stats['value'])).sum()))
+
+        rolling = pd.DataFrame({'date': nav['date'].values, 'nav': nav['nav'].values, **stats})
+        rolling = rolling.dropna()
+        return self._populate_df_with_scheme_details(rolling)
+
+    @_memoized
+    def rolling_risk_statistics(self, window, period = '15y', sampling_period = '1d', risk_free = 0.0):
+        """
+        Rolling annualized volatility, max drawdown, Sharpe and Sortino ratios over windows of the given length.
+        :param risk_free: annual risk free rate the Sharpe and Sortino ratios are measured against, e.g. 0.065
+        """
+        nav = self.scheme_details.get_nav(period)
+        if sampling_period != '1d':
+            nav = nav.resample(sampling_period, on='date').last().reset_index()
+        nav = nav.dropna()
+        days = convert_period_to_days(window)
+
+        with instrumentation.stage('risk'):
+            stats = risk.risk_statistics(nav['date'].values, nav['nav'].to_numpy(dtype=float), days, risk_free)
+
+        rolling = pd.DataFrame({'date': nav['date'].values, **stats})
+        rolling = rolling.dropna()
+        return self._populate_df_with_scheme_details(rolling)
+
+    def _returns_against_benchmark(self, period, sampling_period, benchmark):
+        if benchmark is None:
+            benchmark = self.scheme_details.get_scheme_details()['benchmark'].iloc[0]
+        benchmark_details = SchemeDetails(benchmark)
+        if not benchmark_details.get_scheme_details()['symbol'].iloc[0]:
+            raise ValueError(f"No NAV symbol for benchmark {benchmark!r}")
+
+        navs = []
+        for name, details in (('fund', self.scheme_details), ('benchmark', benchmark_details)):
+            nav = details.get_nav(period)
+            if sampling_period != '1d':
+                nav = nav.resample(sampling_period, on='date').last().reset_index()
+            navs.append(nav.dropna().set_index('date')['nav'].rename(name))
+
+        # Returns only over dates where both the fund and the benchmark have a NAV
+        joined = pd.concat(navs, axis=1, join='inner').sort_index()
+        return joined.pct_change().iloc[1:].rename_axis('date').reset_index()
+
+    @staticmethod
     def _market_capture_ratio(returns):
         """
         Function to calculate the upside and downside capture for a given set of returns.
@@ -131,11 +427,16 @@ class Measures:
 class SchemeDetails:
     def __init__(self, fund):
         self.fund = fund
-        self.scheme_details = self._get_scheme_details()
+        with instrumentation.stage('resolve'):
+            self.scheme_details = self._get_scheme_details()
 
     def get_scheme_details(self):
         return self.scheme_details
 
+    @functools.cached_property
+    def symbol(self):
+        return self.scheme_details['symbol'].iloc[0]
+
     def get_nav(self, period):
         return self._get_nav(period)
 
@@ -143,46 +444,49 @@ class SchemeDetails:
         if self.fund == 'NIFTY 50':
             return self._build_benchmark_details(self.fund)
 
+        # The frame of a fund is built once per resolver, every SchemeDetails of it gets a shallow copy.
+        # Held as a single object block, a copy of the 7 string columns costs 7 blocks otherwise
+        return get_resolver().details(self.fund, lambda fund: self._resolve().astype(object)).copy(deep=False)
+
+    def _resolve(self):
+        schemes, eq_schemes, resolver = get_schemes(), get_eq_schemes(), get_resolver()
+
         if self._is_benchmark():
-            benchmark = eq_schemes['benchmark'][eq_schemes['benchmark'].str.startswith(self.fund, na=False)].iloc[0]
+            benchmark = resolver.benchmark(self.fund)
             benchmark = benchmark.replace('Total Return Index', '').strip()
             return self._build_benchmark_details(benchmark)
 
         scheme_name = None
         scheme_df = None
         if self._is_scheme_code():
-            scheme_df = schemes[schemes['schemeCode'] == self.fund]
+            scheme_df = schemes.iloc[resolver.scheme_code_rows(self.fund)]
             scheme_name = scheme_df['shortName'].iloc[0]
         else:
-            trunc = truncate_string(self.fund, 31)
-            scheme_df = schemes[schemes['shortName'].str.startswith(trunc, na=False)]
-            scheme_df = self._get_direct_growth_fund(scheme_df)
+            # shortName is cut off at SHORT_NAME_LENGTH, longer names can only match its prefix
+            trunc = truncate_string(self.fund, search.SHORT_NAME_LENGTH)
+            scheme_df = schemes.iloc[resolver.scheme_rows(trunc)]
             scheme_name = self.fund
-        assert len(scheme_df) == 1, f"DataFrame has {len(scheme_df)} rows, expected exactly 1 row."
+        assert len(scheme_df) == 1, f"DataFrame has {len(scheme_df)} rows, expected exactly 1 row.{self._suggestions()}"
 
-        eq_scheme = eq_schemes[eq_schemes['scheme_name'].str.startswith(scheme_name, na=False)]
+        eq_scheme = eq_schemes.iloc[resolver.eq_scheme_rows(scheme_name)]
+        assert len(eq_scheme) > 0, f"{scheme_name!r} is not in eq_schemes.{self._suggestions()}"
+        scheme_df = scheme_df.copy()
         scheme_df['benchmark'] = eq_scheme['benchmark'].iloc[0]
         scheme_df['schemeName'] = eq_scheme['scheme_name'].iloc[0]
         scheme_df['category'] = eq_scheme['category'].iloc[0]
         
         return scheme_df[COLUMNS]
 
-    def _get_direct_growth_fund(self, scheme_df):
-        dir_growth_df = scheme_df[scheme_df['longName'].str.contains('Dir Gr', na=False)]
-        if len(dir_growth_df) > 0:
-            return dir_growth_df
-
-        non_idcw = scheme_df[~scheme_df['longName'].str.contains('IDCW', na=False)]
-        if len(non_idcw) == 1:
-            return non_idcw
-
-        return scheme_df.head(1)
+    def _suggestions(self):
+        if self._is_scheme_code():
+            return ''
+        return f" Closest funds: {suggest_funds(self.fund)}"
 
     def _is_benchmark(self):
         if self.fund == 'NIFTY 50':
             return True
 
-        return len(eq_schemes[eq_schemes['benchmark'].str.startswith(self.fund, na=False)]) > 1
+        return get_resolver().is_benchmark(self.fund)
 
     def _build_benchmark_details(self, benchmark):
         benchmark_row = {}
@@ -212,8 +516,11 @@ class SchemeDetails:
 
         end_date = str(datetime.date.today())
         symbol = self.scheme_details['symbol'].iloc[0]
-        nav_df = yf.download(symbol, start_date, end_date)
-        return nav_df.reset_index()[['Date', 'Adj Close']].rename(columns={'Date': 'date', 'Adj Close': 'nav'})
+        if _panel_serves(symbol, start_date, end_date):
+            with instrumentation.stage('nav_panel'):
+                return nav_panel.get(symbol, start_date, end_date)
+        with instrumentation.stage('nav'):
+            return nav_store.get(symbol, start_date, end_date)
 
 
 def convert_period_to_date(period):
@@ -247,8 +554,21 @@ def convert_period_to_days(period):
     
     return (current_date-start_date).days
 
+def convert_period_to_months(period):
+    # Whole months of a period such as '3y' or '1y6m', days are not counted
+    years = re.findall(r'(\d+)y', period)
+    months = re.findall(r'(\d+)m', period)
+    return 12 * (int(years[0]) if years else 0) + (int(months[0]) if months else 0)
+
 def subtract_days(date, days):
     return date - timedelta(days=days)
     
+def format_returns(df, columns = ('ratio',)):
+    # Percentage strings for display only, results stay numeric everywhere else
+    formatted = df.copy()
+    for column in columns:
+        formatted[column] = formatted[column].map('{:.2%}'.format)
+    return formatted
+
 def truncate_string(s, max_length):
     return s[:max_length] if len(s) > max_length else s
@@ -0,0 +1,42 @@
+import os
+
+import pandas as pd
+
+SCHEMES_PATH = './data/scheme_details.csv'
+EQ_SCHEMES_PATH = './data/equity_schemes.csv'
+
+
+def snapshot_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.feather'
+
+
+def load(csv_path):
+    """
+    Function to read a reference CSV, from its Feather snapshot when the snapshot is at least as new
+    as the CSV. The snapshot is memory mapped, so its columns are not parsed or copied on load.
+    Falls back to the CSV when there is no snapshot or pyarrow is not installed.
+    """
+    path = snapshot_path(csv_path)
+    csv_mtime = os.path.getmtime(csv_path) if os.path.exists(csv_path) else 0
+    if os.path.exists(path) and os.path.getmtime(path) >= csv_mtime:
+        try:
+            from pyarrow import feather
+        except ImportError:
+            feather = None
+        if feather is not None:
+            return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+
+    return pd.read_csv(csv_path)
+
+
+def build_snapshot(csv_path):
+    from pyarrow import feather
+
+    df = pd.read_csv(csv_path)
+    feather.write_feather(df, snapshot_path(csv_path), compression='uncompressed')
+    return snapshot_path(csv_path)
+
+
+if __name__ == '__main__':
+    for csv_path in (SCHEMES_PATH, EQ_SCHEMES_PATH):
+        print(f'Wrote {build_snapshot(csv_path)}')
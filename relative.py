@@ -0,0 +1,49 @@
+import numpy as np
+
+import rolling_engine
+
+
+def relative_statistics(fund_returns, benchmark_returns, start, periods_per_year):
+    """
+    Function to calculate fund vs benchmark statistics over the windows returns[start[i]:i+1] of every i.
+    Every statistic comes from prefix sums, so all windows together cost O(n) whatever their length.
+    Capture ratios geometrically link returns through prefix sums of log returns.
+    :param fund_returns: np.ndarray of periodic fund returns
+    :param benchmark_returns: np.ndarray of benchmark returns on the same dates
+    :param start: np.ndarray of window start indices
+    :param periods_per_year: return periods in a year, used to annualize alpha and tracking error
+    :return: dict of statistic name to np.ndarray
+    """
+    fund = np.asarray(fund_returns, dtype=float)
+    benchmark = np.asarray(benchmark_returns, dtype=float)
+    n = np.arange(1, len(fund) + 1) - start
+
+    def sums(values):
+        return rolling_engine.window_sums(values, start)
+
+    fund_c, fund_mean = rolling_engine.centre(fund)
+    benchmark_c, benchmark_mean = rolling_engine.centre(benchmark)
+    sum_f, mean_f = rolling_engine.window_means(fund_c, fund_mean, start, n)
+    sum_b, mean_b = rolling_engine.window_means(benchmark_c, benchmark_mean, start, n)
+    var_f = rolling_engine.window_covariances(fund_c, fund_c, sum_f, sum_f, start, n)
+    var_b = rolling_engine.window_covariances(benchmark_c, benchmark_c, sum_b, sum_b, start, n)
+    cov = rolling_engine.window_covariances(fund_c, benchmark_c, sum_f, sum_b, start, n)
+
+    up = benchmark >= 0
+    log_fund, log_benchmark = np.log1p(fund), np.log1p(benchmark)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = cov / var_b
+        tracking_error = np.sqrt(np.maximum(var_f + var_b - 2*cov, 0) * periods_per_year)
+
+        up_ratio = np.expm1(sums(log_fund*up)) / np.expm1(sums(log_benchmark*up))
+        down_ratio = np.expm1(sums(log_fund*~up)) / np.expm1(sums(log_benchmark*~up))
+
+        return {
+            'upsideCapture': up_ratio * 100,
+            'downsideCapture': down_ratio * 100,
+            'beta': beta,
+            'alpha': (mean_f - beta*mean_b) * periods_per_year,
+            'trackingError': tracking_error,
+            'informationRatio': (mean_f - mean_b) * periods_per_year / tracking_error,
+        }
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+
+class PrefixIndex:
+    """
+    Sorted array of strings, answering str.startswith lookups with two binary searches.
+    Matches are returned as row positions in the original column, in row order.
+    """
+
+    def __init__(self, values):
+        values = pd.Series(values)
+        valid = values.map(lambda x: isinstance(x, str)).to_numpy(dtype=bool)
+        keys = values[valid].to_numpy(dtype=str)
+        order = np.argsort(keys, kind='stable')
+
+        self.keys = keys[order]
+        self.positions = np.flatnonzero(valid)[order]
+
+    def span(self, prefix):
+        lo = np.searchsorted(self.keys, prefix, side='left')
+        hi = np.searchsorted(self.keys, prefix + '\U0010ffff', side='left')
+        return lo, hi
+
+    def match(self, prefix):
+        lo, hi = self.span(prefix)
+        return np.sort(self.positions[lo:hi])
+
+
+class SchemeResolver:
+    """
+    Index over schemes (scheme_details.csv) and eq_schemes (equity_schemes.csv) built once at load time.
+    Resolves fund names, scheme codes and benchmarks the same way as the row by row string scans
+    it replaces, with every result memoized.
+    """
+
+    def __init__(self, schemes, eq_schemes):
+        self.short_names = PrefixIndex(schemes['shortName'])
+        self.scheme_names = PrefixIndex(eq_schemes['scheme_name'])
+        self.benchmarks = PrefixIndex(eq_schemes['benchmark'])
+        self.benchmark_names = eq_schemes['benchmark'].to_numpy()
+
+        self.code_rows = {}
+        for row, code in enumerate(schemes['schemeCode']):
+            self.code_rows.setdefault(code, []).append(row)
+        self.code_rows = {code: np.array(rows) for code, rows in self.code_rows.items()}
+
+        long_names = schemes['longName']
+        self._direct_growth = long_names.str.contains('Dir Gr', na=False).to_numpy(dtype=bool)
+        self._idcw = long_names.str.contains('IDCW', na=False).to_numpy(dtype=bool)
+
+        # Preferred rows of every fund family, i.e. all rows sharing a shortName
+        self.family_choice = {}
+        boundaries = np.flatnonzero(self.short_names.keys[1:] != self.short_names.keys[:-1]) + 1
+        for lo, hi in zip(np.r_[0, boundaries], np.r_[boundaries, len(self.short_names.keys)]):
+            rows = np.sort(self.short_names.positions[lo:hi])
+            self.family_choice[self.short_names.keys[lo]] = self._prefer_direct_growth(rows)
+
+        self._cache = {}
+
+    def scheme_rows(self, name):
+        """
+        Rows of schemes whose shortName starts with name, narrowed to the Direct Growth plan,
+        else the only non IDCW plan, else the first match.
+        """
+        return self._memoize('scheme', name, self._scheme_rows)
+
+    def scheme_code_rows(self, scheme_code):
+        return self.code_rows.get(scheme_code, np.array([], dtype=int))
+
+    def eq_scheme_rows(self, scheme_name):
+        return self._memoize('eq_scheme', scheme_name, self.scheme_names.match)
+
+    def benchmark_rows(self, benchmark):
+        return self._memoize('benchmark', benchmark, self.benchmarks.match)
+
+    def is_benchmark(self, fund):
+        return len(self.benchmark_rows(fund)) > 1
+
+    def benchmark(self, fund):
+        return self.benchmark_names[self.benchmark_rows(fund)[0]]
+
+    def details(self, fund, build):
+        """
+        Scheme details frame of fund, built once with build(fund). Callers must not modify it in place.
+        """
+        return self._memoize('details', fund, build)
+
+    def _scheme_rows(self, name):
+        lo, hi = self.short_names.span(name)
+        if lo == hi:
+            return np.array([], dtype=int)
+
+        keys = self.short_names.keys
+        if keys[lo] == keys[hi - 1]:
+            return self.family_choice[keys[lo]]
+        return self._prefer_direct_growth(np.sort(self.short_names.positions[lo:hi]))
+
+    def _prefer_direct_growth(self, rows):
+        direct_growth = rows[self._direct_growth[rows]]
+        if len(direct_growth) > 0:
+            return direct_growth
+
+        non_idcw = rows[~self._idcw[rows]]
+        if len(non_idcw) == 1:
+            return non_idcw
+
+        return rows[:1]
+
+    def _memoize(self, kind, key, func):
+        try:
+            result = self._cache[kind, key]
+            instrumentation.count('resolver_cache_hits')
+            return result
+        except KeyError:
+            instrumentation.count('resolver_cache_misses')
+            result = self._cache[kind, key] = func(key)
+            return result
@@ -0,0 +1,117 @@
+import numpy as np
+
+import rolling_engine
+
+
+def risk_statistics(dates, navs, days, risk_free=0.0):
+    """
+    Function to calculate rolling risk statistics of every window of days ending on each date.
+    A window holds the periodic returns dated within (date - days, date], as in rolling relative statistics.
+    Sums of returns come from prefix sums and drawdowns from one sliding window pass, so all windows
+    together cost O(n) whatever their length.
+    :param dates: sorted array of datetime64 dates
+    :param navs: np.ndarray of NAVs, a single series or a dates x funds panel with NaN where a fund has no NAV
+    :param days: window length in days
+    :param risk_free: annual risk free rate, e.g. 0.065
+    :return: dict of statistic name to np.ndarray shaped like navs, NaN where the window is not fully
+    covered by the fund's history. maxDrawdown is the worst peak to trough return, e.g. -0.35
+    """
+    dates = np.asarray(dates).astype('datetime64[ns]')
+    navs = np.asarray(navs, dtype=float)
+    panel = navs.reshape(len(navs), -1)
+
+    filled = rolling_engine.forward_fill(panel)
+    returns = rolling_engine.panel_returns(panel)
+    has = ~np.isnan(returns)
+
+    start = rolling_engine.trailing_start_indices(dates, days)
+    ppy = _periods_per_year(dates, panel)
+    risk_free_period = (1 + risk_free)**(1/ppy) - 1
+
+    def sums(values):
+        return rolling_engine.window_sums(np.where(has, values, 0), start)
+
+    centred, centre = rolling_engine.centre(returns, has)
+    n = sums(np.ones_like(returns))
+    sum_c, mean = rolling_engine.window_means(centred, centre, start, n)
+    variance = rolling_engine.window_covariances(centred, centred, sum_c, sum_c, start, n)
+    shortfall = np.minimum(returns - risk_free_period, 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volatility = np.sqrt(np.maximum(variance, 0) * ppy)
+        downside = np.sqrt(sums(shortfall*shortfall) / n * ppy)
+        excess = mean*ppy - risk_free
+
+        # The NAV before the first return of a window is where its drawdowns are measured from
+        drawdown = max_drawdowns(np.log(filled), np.maximum(start - 1, 0))
+
+        stats = {
+            'volatility': volatility,
+            'maxDrawdown': drawdown,
+            'sharpe': excess / volatility,
+            'sortino': excess / downside,
+        }
+
+    # Only windows fully covered by the fund's history
+    first = np.argmax(~np.isnan(panel), axis=0)
+    covered = (dates - np.timedelta64(days, 'D'))[:, None] >= dates[first][None, :]
+    covered &= ~np.isnan(panel)
+    return {name: np.where(covered, values, np.nan).reshape(navs.shape) for name, values in stats.items()}
+
+
+def max_drawdowns(log_navs, start):
+    """
+    Largest drop of log_navs[start[i]:i+1] from a running peak, for every i, returned as a return (<= 0).
+    start must be non-decreasing. Windows are answered with two stacks: rows are cut into segments at
+    the rows where the front stack runs empty, and every window merges the suffix aggregate of its start
+    with the prefix aggregate of its end. Segments only depend on start, so every aggregate is a
+    vectorized accumulate shared by all funds of a panel. NaN rows are skipped.
+    """
+    log_navs = np.asarray(log_navs, dtype=float)
+    values = log_navs.reshape(len(log_navs), -1)
+    n = len(values)
+    highs = np.where(np.isnan(values), -np.inf, values)
+    lows = np.where(np.isnan(values), np.inf, values)
+
+    # Rows where the front stack is exhausted and the back stack is flipped onto it
+    flips = []
+    back_start = 0
+    for i, window_start in enumerate(start.tolist()):
+        if window_start >= back_start:
+            flips.append(i)
+            back_start = i + 1
+    bounds = np.r_[0, np.add(flips, 1)]
+    if bounds[-1] < n:
+        bounds = np.r_[bounds, n]
+
+    prefix_high, prefix_low, prefix_drop = np.empty_like(highs), np.empty_like(highs), np.empty_like(highs)
+    suffix_high, suffix_low, suffix_drop = np.empty_like(highs), np.empty_like(highs), np.empty_like(highs)
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        h, l = highs[lo:hi], lows[lo:hi]
+        prefix_high[lo:hi] = np.maximum.accumulate(h, axis=0)
+        prefix_low[lo:hi] = np.minimum.accumulate(l, axis=0)
+        prefix_drop[lo:hi] = np.maximum.accumulate(prefix_high[lo:hi] - l, axis=0)
+        suffix_high[lo:hi] = np.maximum.accumulate(h[::-1], axis=0)[::-1]
+        suffix_low[lo:hi] = np.minimum.accumulate(l[::-1], axis=0)[::-1]
+        suffix_drop[lo:hi] = np.maximum.accumulate((h - suffix_low[lo:hi])[::-1], axis=0)[::-1]
+
+    # A window ending on a flip row lies in one segment, the others span the previous segment and their own
+    flipped = np.zeros(n, dtype=bool)
+    flipped[flips] = True
+    rows = np.arange(n)
+    end_drop = np.where(flipped[:, None], -np.inf, prefix_drop)
+    end_low = np.where(flipped[:, None], np.inf, prefix_low)
+    drop = np.maximum(np.maximum(suffix_drop[start], end_drop[rows]), suffix_high[start] - end_low[rows])
+
+    drawdown = np.where(np.isneginf(drop), np.nan, np.expm1(-np.where(np.isneginf(drop), 0, drop)))
+    return drawdown.reshape(log_navs.shape)
+
+
+def _periods_per_year(dates, panel):
+    # Per fund, as rolling_engine.periods_per_year over the dates the fund has a NAV on
+    valid = ~np.isnan(panel)
+    first = np.argmax(valid, axis=0)
+    last = len(panel) - 1 - np.argmax(valid[::-1], axis=0)
+    years = (dates[last] - dates[first]) / np.timedelta64(1, 'D') / 365.25
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (valid.sum(axis=0) - 1) / years
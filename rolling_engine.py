@@ -0,0 +1,161 @@
+import numpy as np
+
+MATCH_MODES = ('exact', 'prior')
+
+
+def window_start_indices(dates, days, match='exact', ends=None):
+    """
+    Function to find the first NAV of every rolling window.
+    A window ending on dates[i] starts days-1 days earlier. With match='exact' the window is only
+    valid if there is a NAV on that start date, with match='prior' the nearest earlier trading day is used.
+    :param dates: sorted array of datetime64 dates
+    :param days: window length in days
+    :param match: 'exact' or 'prior'
+    :param ends: optional indices of the window ends to evaluate, all dates by default
+    :return: np.ndarray of start indices, -1 where the window has no valid start
+    """
+    if match not in MATCH_MODES:
+        raise ValueError(f"match must be one of {MATCH_MODES}, got {match!r}")
+
+    dates = np.asarray(dates).astype('datetime64[ns]')
+    # 1 is subtracted from days as window has one day less
+    targets = (dates if ends is None else dates[ends]) - np.timedelta64(days - 1, 'D')
+
+    if match == 'exact':
+        start = np.searchsorted(dates, targets, side='left')
+        found = start < len(dates)
+        found[found] = dates[start[found]] == targets[found]
+    else:
+        start = np.searchsorted(dates, targets, side='right') - 1
+        found = start >= 0
+
+    return np.where(found, start, -1)
+
+
+def rolling_ratio(navs, start, ends=None):
+    """
+    Ratio of the last NAV to the first NAV of every window, NaN where the window has no valid start.
+    navs can be a single series or a dates x funds panel, start must have the shape of navs[ends].
+    """
+    navs = np.asarray(navs, dtype=float)
+    last = navs if ends is None else navs[ends]
+    valid = start >= 0
+    first = np.take_along_axis(navs, np.where(valid, start, 0), axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = last / first
+    return np.where(valid, ratio, np.nan)
+
+
+def absolute_returns(navs, start, ends=None):
+    return rolling_ratio(navs, start, ends) - 1
+
+
+def cagr_returns(navs, start, years, ends=None):
+    with np.errstate(invalid='ignore'):
+        return rolling_ratio(navs, start, ends)**(1/years) - 1
+
+
+def log_returns(log_navs, start, years=1, ends=None):
+    """
+    Same as cagr_returns from log NAVs, so many windows over one series share a single np.log pass.
+    The log return of a window is the difference of the log NAVs at its ends.
+    """
+    log_navs = np.asarray(log_navs, dtype=float)
+    last = log_navs if ends is None else log_navs[ends]
+    valid = start >= 0
+    first = np.take_along_axis(log_navs, np.where(valid, start, 0), axis=0)
+    return np.where(valid, np.expm1((last - first) / years), np.nan)
+
+
+def panel_window_start_indices(dates, panel, days, match='exact'):
+    """
+    Same as window_start_indices for a dates x funds panel, where NaN marks dates a fund has no NAV.
+    :return: np.ndarray of start indices with the shape of panel, -1 where the window has no valid start
+    """
+    start = window_start_indices(dates, days, match)
+    if match == 'exact':
+        # A fund with no NAV on the start date gets a NaN ratio from the NaN first value
+        return np.broadcast_to(start[:, None], panel.shape)
+
+    # Nearest prior trading day of each fund is the last row, at or before the start row, where it has a NAV
+    rows = np.arange(len(dates))[:, None]
+    last_valid = np.maximum.accumulate(np.where(np.isnan(panel), -1, rows), axis=0)
+    return np.where(start[:, None] >= 0, last_valid[np.maximum(start, 0)], -1)
+
+
+def forward_fill(panel):
+    """
+    Last NAV at or before every date of a dates x funds panel, NaN before a fund's first NAV.
+    """
+    rows = np.arange(len(panel))[:, None]
+    last_valid = np.maximum.accumulate(np.where(np.isnan(panel), -1, rows), axis=0)
+    filled = panel[np.maximum(last_valid, 0), np.arange(panel.shape[1])]
+    return np.where(last_valid >= 0, filled, np.nan)
+
+
+def panel_returns(panel):
+    """
+    Periodic return of every fund of a dates x funds panel on the dates it has a NAV, from its previous NAV,
+    so a date another fund trades on does not split a fund's return. NaN on dates a fund has no return.
+    """
+    previous = np.vstack([np.full((1, panel.shape[1]), np.nan), forward_fill(panel)[:-1]])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return panel / previous - 1
+
+
+def trailing_start_indices(dates, days):
+    """
+    Index of the first observation inside the window (date - days, date] of every date,
+    used for statistics over the returns that fall within a window.
+    """
+    dates = np.asarray(dates).astype('datetime64[ns]')
+    return np.searchsorted(dates, dates - np.timedelta64(days, 'D'), side='right')
+
+
+def window_sums(values, start):
+    """
+    Sums of values[start[i]:i+1] for every i from one prefix sum, values can be a series or a panel.
+    """
+    values = np.asarray(values, dtype=float)
+    prefix = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+    return prefix[1:] - prefix[start]
+
+
+def centre(values, present=None):
+    """
+    Values less their mean over the whole sample, 0 where not present, so window sums of their squares
+    and products stay well conditioned.
+    :param present: boolean mask of the values to use, not NaN by default
+    :return: (centred values, mean), the mean per column of a panel
+    """
+    values = np.asarray(values, dtype=float)
+    if present is None:
+        present = ~np.isnan(values)
+    mean = np.nanmean(np.where(present, values, np.nan), axis=0)
+    return np.where(present, values - mean, 0.0), mean
+
+
+def window_means(centred, mean, start, n):
+    """
+    Means of every window centred[start[i]:i+1] holding n[i] values, centred and mean as given by centre.
+    :return: (window sums of centred, window means)
+    """
+    sum_c = window_sums(centred, start)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return sum_c, sum_c/n + mean
+
+
+def window_covariances(x, y, sum_x, sum_y, start, n):
+    """
+    Sample covariances of centred x and y over every window [start[i], i] holding n[i] values,
+    the variances when y is x. sum_x and sum_y are the window sums from window_means.
+    NaN for windows of fewer than 2 values.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (window_sums(x*y, start) - sum_x*sum_y/n) / (n - 1)
+
+
+def periods_per_year(dates):
+    dates = np.asarray(dates).astype('datetime64[ns]')
+    years = (dates[-1] - dates[0]) / np.timedelta64(1, 'D') / 365.25
+    return (len(dates) - 1) / years
@@ -0,0 +1,218 @@
+import html
+import re
+
+import numpy as np
+
+from codes import ALL_CODES_PATH, CODES_PATH, iter_all_codes, iter_codes
+
+# Yahoo Finance cuts shortName, and many codes.json names, off at this many characters
+SHORT_NAME_LENGTH = 31
+
+PLANS = ('direct', 'regular')
+OPTIONS = ('growth', 'idcw')
+
+# Words of full and abbreviated (scheme_details longName) scheme names that give away the plan and option
+_DIRECT = {'direct', 'dir'}
+_REGULAR = {'regular', 'reg'}
+_GROWTH = {'growth', 'gr'}
+_IDCW = {'idcw', 'dividend', 'div', 'payout', 'reinvestment', 'reinvest'}
+_CUT_OFF_WORDS = ('direct', 'growth', 'dividend', 'payout', 'reinvestment')
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+# 'Re-investment' and 'Re investment' are both a reinvestment
+_REINVEST = re.compile(r're[\s-]*invest', re.IGNORECASE)
+
+# Queries match on their weighted share of trigrams found in a name, ties go to the name closest in length
+_LENGTH_WEIGHT = 0.1
+# Per plan or option named in a query that a name also has
+_PLAN_WEIGHT = 0.02
+# Share of names above which a trigram is a stop trigram
+_STOP_SHARE = 0.25
+
+
+def normalize(name):
+    return _NON_ALNUM.sub(' ', html.unescape(name).lower()).strip()
+
+
+def plan_words(name):
+    words = normalize(_REINVEST.sub('reinvest', name)).split()
+    # A name cut off at SHORT_NAME_LENGTH can end in the start of a word, e.g. 'Direc' or 'Grow'
+    if len(name) == SHORT_NAME_LENGTH and words and len(words[-1]) >= 3:
+        words[-1] = next((word for word in _CUT_OFF_WORDS if word.startswith(words[-1])), words[-1])
+    return set(words)
+
+
+def trigrams(text):
+    padded = f' {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SchemeIndex:
+    """
+    Trigram inverted index over scheme names, for ranked fuzzy search that tolerates typos, word order,
+    abbreviations and names cut off at 31 characters, instead of a str.contains scan of every row.
+    A scheme code can be indexed under several names, e.g. its codes.json name and its scheme_details longName,
+    it is then found by any of them and listed once. Postings are one int32 array addressed by trigram,
+    so a query costs one bincount over the postings of its trigrams.
+    """
+
+    def __init__(self, entries):
+        """
+        :param entries: iterable of (scheme code, name) pairs
+        """
+        names_by_code = {}
+        for code, name in entries:
+            if isinstance(name, str) and name.strip():
+                names = names_by_code.setdefault(code, [])
+                if html.unescape(name) not in names:
+                    names.append(html.unescape(name))
+
+        self.codes = list(names_by_code)
+        self.names = [names[0] for names in names_by_code.values()]
+
+        postings = {}
+        doc_codes, doc_grams = [], []
+        direct, growth, idcw = [], [], []
+        for i, names in enumerate(names_by_code.values()):
+            words = set()
+            for name in names:
+                words.update(plan_words(name))
+                grams = trigrams(normalize(name))
+                for gram in grams:
+                    postings.setdefault(gram, []).append(len(doc_codes))
+                doc_codes.append(i)
+                doc_grams.append(grams)
+            direct.append(bool(words & _DIRECT))
+            idcw.append(bool(words & _IDCW))
+            growth.append(bool(words & _GROWTH) and not idcw[-1])
+
+        self._grams = {}
+        offsets = [0]
+        for gram, docs in postings.items():
+            self._grams[gram] = len(offsets) - 1
+            offsets.append(offsets[-1] + len(docs))
+        self._offsets = np.array(offsets, dtype=np.int64)
+        self._postings = np.fromiter((doc for docs in postings.values() for doc in docs),
+                                     dtype=np.int32, count=offsets[-1])
+        # Rare trigrams, such as those of an AMC name, count for more than ' fu', 'fun', 'und'
+        counts = np.diff(self._offsets)
+        self._weights = np.log1p(len(doc_codes) / counts)
+        self._unknown_weight = np.log1p(len(doc_codes))
+        # Trigrams of most names tell little apart and make up most postings, they are only read when
+        # a query has no other, e.g. 'fund'
+        self._stop = counts > len(doc_codes) * _STOP_SHARE
+
+        self._doc_codes = np.array(doc_codes, dtype=np.int32)
+        self._doc_weights = np.zeros(len(doc_codes))
+        for doc, grams in enumerate(doc_grams):
+            ids = [self._grams[gram] for gram in grams]
+            self._doc_weights[doc] = self._weights[ids][~self._stop[ids]].sum()
+
+        # A plan without Direct in its name is a Regular plan, the option is only known when it is named
+        self.direct = np.array(direct, dtype=bool)
+        self.growth = np.array(growth, dtype=bool)
+        self.idcw = np.array(idcw, dtype=bool)
+        self._index = {code: i for i, code in enumerate(self.codes)}
+
+    @classmethod
+    def from_sources(cls, codes_path=CODES_PATH, schemes=None, all_codes_path=ALL_CODES_PATH):
+        """
+        Index over the codes.json and scheme_codes_all.json names, unless their path is None, and, given
+        the schemes DataFrame of scheme_details.csv, its longName and shortName of every schemeCode.
+        """
+        entries = list(iter_codes(codes_path)) if codes_path is not None else []
+        if all_codes_path is not None:
+            entries.extend(iter_all_codes(all_codes_path))
+        if schemes is not None:
+            for column in ('longName', 'shortName'):
+                entries.extend(zip(schemes['schemeCode'], schemes[column]))
+        return cls(entries)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code):
+        return code in self._index
+
+    def search(self, query, k=10, plan=None, option=None):
+        """
+        Function to find the k scheme codes whose names best match query.
+        :param plan: 'direct' or 'regular' to only return that plan, None for both
+        :param option: 'growth' or 'idcw' to only return that option, None for any
+        :return: list of {'schemeCode', 'name', 'plan', 'option', 'score'} dicts, best match first,
+        score is 1 for a name equal to the query, down to 0 for one sharing none of its trigrams
+        """
+        allowed = self._allowed(plan, option)
+        query_grams = trigrams(normalize(query))
+        grams = np.array([self._grams[gram] for gram in query_grams if gram in self._grams], dtype=np.int64)
+        if len(grams) == 0:
+            return []
+        # Trigrams no name has weigh as much as the rarest, a typo costs the query its share of them
+        unknown = len(query_grams) - len(grams)
+        if not self._stop[grams].all():
+            grams = grams[~self._stop[grams]]
+        query_weight = self._weights[grams].sum() + self._unknown_weight * unknown
+
+        lengths = self._offsets[grams + 1] - self._offsets[grams]
+        postings = np.concatenate([self._postings[self._offsets[g]:self._offsets[g + 1]] for g in grams])
+        shared = np.bincount(postings, weights=np.repeat(self._weights[grams], lengths), minlength=len(self._doc_codes))
+
+        # Only names sharing a trigram with the query are scored
+        docs = np.flatnonzero(shared)
+        codes = self._doc_codes[docs]
+        if allowed is not None:
+            docs, codes = docs[allowed[codes]], codes[allowed[codes]]
+        shared = shared[docs]
+        scores = shared / query_weight + _LENGTH_WEIGHT * shared / (query_weight + self._doc_weights[docs] - shared)
+        # Plan and option words are stop trigrams, so they rank through the flags they name instead
+        scores += _PLAN_WEIGHT * self._named_plan(plan_words(query), codes)
+        if len(self._doc_codes) > len(self.codes):
+            # Names of a code are consecutive docs, a code scores as its best name
+            starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+            scores, codes = np.maximum.reduceat(scores, starts), codes[starts]
+
+        if k < len(codes):
+            best = np.argpartition(-scores, k)[:k]
+            scores, codes = scores[best], codes[best]
+        order = np.argsort(-scores, kind='stable')
+        return [self._match(i, score) for i, score in zip(codes[order], scores[order])]
+
+    def best(self, query, plan=None, option=None):
+        matches = self.search(query, 1, plan, option)
+        return matches[0] if matches else None
+
+    def _allowed(self, plan, option):
+        if plan is not None and plan.lower() not in PLANS:
+            raise ValueError(f"plan must be one of {PLANS}, got {plan!r}")
+        if option is not None and option.lower() not in OPTIONS:
+            raise ValueError(f"option must be one of {OPTIONS}, got {option!r}")
+
+        allowed = None
+        if plan is not None:
+            allowed = self.direct if plan.lower() == 'direct' else ~self.direct
+        if option is not None:
+            named = self.growth if option.lower() == 'growth' else self.idcw
+            allowed = named if allowed is None else allowed & named
+        return allowed
+
+    def _named_plan(self, words, codes):
+        named = np.zeros(len(codes))
+        if words & _DIRECT:
+            named += self.direct[codes]
+        elif words & _REGULAR:
+            named += ~self.direct[codes]
+        if words & _IDCW:
+            named += self.idcw[codes]
+        elif words & _GROWTH:
+            named += self.growth[codes]
+        return named
+
+    def _match(self, i, score):
+        option = 'Growth' if self.growth[i] else 'IDCW' if self.idcw[i] else None
+        return {
+            'schemeCode': self.codes[i],
+            'name': self.names[i],
+            'plan': 'Direct' if self.direct[i] else 'Regular',
+            'option': option,
+            'score': round(min(float(score) / (1 + _LENGTH_WEIGHT), 1.0), 4),
+        }
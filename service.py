@@ -0,0 +1,279 @@
+import argparse
+import collections
+import json
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import pandas as pd
+
+import instrumentation
+import ratios
+from nav_store import NavStore
+
+DEFAULT_PORT = 8050
+
+# SchemeDetails raises these for a fund it cannot resolve
+UNRESOLVED = (AssertionError, IndexError, KeyError)
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class Unresolved(LookupError):
+    pass
+
+
+class QueryService:
+    """
+    Measures and SchemeDetails behind JSON queries, for dashboards that would otherwise run notebooks.
+    Reference data is loaded once, resolved funds are kept in an LRU of Measures, NAVs stay in memory
+    through a NavStore with keep_loaded and repeated results come from ratios.result_cache.
+    Identical queries arriving while one is being computed wait for it instead of computing it again.
+    """
+
+    def __init__(self, max_funds=1024):
+        self.max_funds = max_funds
+        self.requests = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.started = time.time()
+        self._measures = collections.OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.routes = {
+            '/health': self.health,
+            '/stats': self.stats,
+            '/scheme': self.scheme,
+            '/search': self.search,
+            '/rolling_returns': self.rolling_returns,
+            '/multi_window_returns': self.multi_window_returns,
+            '/risk': self.risk,
+            '/sip': self.sip,
+        }
+
+    def warm(self, funds=(), period='15y'):
+        # Loads the reference data and resolves funds and their NAVs ahead of the first queries
+        ratios.get_resolver()
+        ratios.get_scheme_index()
+        for fund in funds:
+            try:
+                self.measures(fund).scheme_details.get_nav(period)
+            except Unresolved:
+                print(f'Could not resolve {fund!r}')
+
+    def measures(self, fund):
+        with self._lock:
+            measures = self._measures.get(fund)
+            if measures is not None:
+                self._measures.move_to_end(fund)
+                return measures
+
+        try:
+            measures = ratios.Measures(fund)
+        except UNRESOLVED as e:
+            # Only errors of resolving the fund blame it, those of a measure are answered as any other
+            raise Unresolved(f'Could not resolve fund {fund!r}: {e}') from e
+        with self._lock:
+            self._measures[fund] = measures
+            while len(self._measures) > self.max_funds:
+                self._measures.popitem(last=False)
+        return measures
+
+    def handle(self, path, params):
+        """
+        :return: (HTTP status, JSON encoded body)
+        """
+        with self._lock:
+            self.requests += 1
+        route = self.routes.get(path)
+        if route is None:
+            return 404, _encode({'error': f'Unknown path {path}', 'paths': sorted(self.routes)})
+
+        try:
+            # Cheap enough that waiting on an identical query would cost more than answering it
+            if path in ('/health', '/stats', '/search'):
+                return 200, _encode(route(params))
+            key = (path, tuple(sorted(params.items())))
+            return 200, self._coalesced(key, lambda: _encode(route(params)))
+        except BadRequest as e:
+            status, error = 400, str(e)
+        except Unresolved as e:
+            status, error = 404, str(e)
+        except ValueError as e:
+            status, error = 400, str(e)
+        except Exception as e:
+            # A failed measure still gets an answer, the connection is not dropped
+            traceback.print_exc()
+            status, error = 500, f'{type(e).__name__}: {e}'
+        with self._lock:
+            self.errors += 1
+        return status, _encode({'error': error})
+
+    def _coalesced(self, key, compute):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = compute()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def health(self, params):
+        return {'status': 'ok', 'offline': ratios.nav_store.offline}
+
+    def stats(self, params):
+        with self._lock:
+            stats = {
+                'requests': self.requests,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'funds': len(self._measures),
+                'uptime': time.time() - self.started,
+            }
+        if ratios.result_cache is not None:
+            stats['resultCache'] = ratios.result_cache.stats()
+        return stats
+
+    def scheme(self, params):
+        return self.measures(_required(params, 'fund')).scheme_details.get_scheme_details()
+
+    def search(self, params):
+        return ratios.get_scheme_index().search(_required(params, 'q'), int(_number(params, 'k', 10)),
+                                                params.get('plan'), params.get('option'))
+
+    def rolling_returns(self, params):
+        measures = self.measures(_required(params, 'fund'))
+        method = measures.cagr_rolling_returns if _flag(params, 'cagr') else measures.rolling_returns
+        return method(_required(params, 'window'), params.get('period', '15y'),
+                      params.get('sampling_period', '1d'), params.get('match', 'exact'))
+
+    def multi_window_returns(self, params):
+        windows = tuple(params.get('windows', '1y,3y,5y,7y,10y').split(','))
+        returns, summary = self.measures(_required(params, 'fund')).multi_window_returns(
+            windows, params.get('period', '15y'), params.get('sampling_period', '1d'), params.get('match', 'exact'))
+        return {'returns': returns, 'summary': summary.reset_index()}
+
+    def risk(self, params):
+        return self.measures(_required(params, 'fund')).rolling_risk_statistics(
+            _required(params, 'window'), params.get('period', '15y'), params.get('sampling_period', '1d'),
+            _number(params, 'risk_free', 0.0))
+
+    def sip(self, params):
+        return self.measures(_required(params, 'fund')).rolling_sip_returns(
+            _required(params, 'window'), params.get('period', '15y'), _number(params, 'amount', 1.0))
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            with instrumentation.stage('request'):
+                status, body = service.handle(url.path, dict(parse_qsl(url.query)))
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(service, host='127.0.0.1', port=DEFAULT_PORT):
+    """
+    Starts the service on a background thread.
+    :return: (server, base_url), stop with server.shutdown()
+    """
+    return start_server(make_handler(service), host, port)
+
+
+def start_server(handler, host='127.0.0.1', port=0):
+    """
+    Function to start a threading HTTP server of handler on a background thread, port 0 picks a free port.
+    :return: (server, base_url), stop with server.shutdown()
+    """
+    server = ThreadingHTTPServer((host, port), handler, bind_and_activate=False)
+    server.daemon_threads = True
+    # The default listen backlog of 5 resets connections under concurrent load
+    server.request_queue_size = 1024
+    server.server_bind()
+    server.server_activate()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://{host}:{server.server_port}'
+
+
+def _required(params, name):
+    if not params.get(name):
+        raise BadRequest(f'Missing query parameter {name!r}')
+    return params[name]
+
+
+def _flag(params, name):
+    return params.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def _number(params, name, default):
+    try:
+        return float(params.get(name, default))
+    except ValueError:
+        raise BadRequest(f'Query parameter {name!r} must be a number')
+
+
+def _encode(payload):
+    return _to_json(payload).encode()
+
+
+def _to_json(value):
+    # DataFrame.to_json encodes dates and NaN (as null) in C, far faster than json.dumps of the records
+    if isinstance(value, pd.DataFrame):
+        return value.to_json(orient='records', date_format='iso')
+    if isinstance(value, dict):
+        return '{' + ','.join(f'{json.dumps(str(key))}:{_to_json(item)}' for key, item in value.items()) + '}'
+    return json.dumps(value, default=_default, separators=(',', ':'))
+
+
+def _default(value):
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local JSON service over Measures and SchemeDetails')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--offline', action='store_true', help='serve NAVs from the local cache only, never download')
+    parser.add_argument('--warm', nargs='*', default=[], help='funds to resolve and load before serving')
+    args = parser.parse_args()
+
+    ratios.nav_store = NavStore(offline=args.offline, keep_loaded=True)
+    service = QueryService()
+    service.warm(args.warm)
+    server, base_url = serve(service, args.host, args.port)
+    print(f'Serving {", ".join(sorted(service.routes))} on {base_url}')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
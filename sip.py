@@ -0,0 +1,116 @@
+import numpy as np
+
+# Bracket of log(1 + rate) the XIRR root is searched in, rates from -99.3% to +14,700% a year
+LOG_RATE_LIMIT = 5.0
+
+
+def add_months(dates, months):
+    """
+    Calendar month arithmetic on datetime64 arrays, a day past the end of the target month is clipped
+    to its last day (Jan 31 + 1 month is Feb 28 or 29), as pd.DateOffset does.
+    :param dates: np.ndarray of datetime64, broadcast against months
+    :param months: int or np.ndarray of months to add
+    :return: np.ndarray of datetime64[D]
+    """
+    dates = np.asarray(dates).astype('datetime64[D]')
+    month_start = dates.astype('datetime64[M]')
+    day = (dates - month_start.astype('datetime64[D]')).astype(int)
+
+    target = month_start + np.asarray(months)
+    days_in_month = ((target + 1).astype('datetime64[D]') - target.astype('datetime64[D]')).astype(int)
+    return target.astype('datetime64[D]') + np.minimum(day, days_in_month - 1)
+
+
+def rolling_sip(dates, navs, months, amount=1.0):
+    """
+    Function to calculate the outcome of a monthly SIP started on every date and held for months.
+    Installments are scheduled monthly on the start date's day, each bought at the NAV of the first trading day
+    on or after it, and the units are valued at the last NAV on or before the start date + months.
+    :param dates: sorted array of datetime64 dates
+    :param navs: np.ndarray of NAVs on those dates
+    :param months: SIP length, at least 1, installments are made at the start of each month
+    :param amount: installment amount
+    :return: dict of statistic name to np.ndarray aligned with the start dates, NaN where the SIP is
+    not over by the last date
+    """
+    if months < 1:
+        raise ValueError(f"A SIP lasts at least one month, got {months} months")
+    days = np.asarray(dates).astype('datetime64[D]')
+    navs = np.asarray(navs, dtype=float)
+    n = len(days)
+
+    scheduled = add_months(days[:, None], np.arange(months)[None, :])
+    bought = np.searchsorted(days, scheduled.ravel(), side='left').reshape(scheduled.shape)
+    valued_on = add_months(days, months)
+    valued = np.searchsorted(days, valued_on, side='right') - 1
+
+    valid = (valued_on <= days[-1]) & (bought[:, -1] <= valued) if n else np.zeros(0, dtype=bool)
+    bought, valued = bought[valid], valued[valid]
+
+    value = (amount / navs[bought]).sum(axis=1) * navs[valued]
+    invested = amount * months
+
+    # Cash flows in years since the first installment, the redemption being the last one
+    first = days[bought[:, 0]]
+    times = np.hstack([(days[bought] - first[:, None]), (days[valued] - first)[:, None]]).astype(float) / 365
+    flows = np.hstack([np.full(bought.shape, -amount), value[:, None]])
+
+    stats = {
+        'invested': np.full(valid.sum(), invested, dtype=float),
+        'value': value,
+        'absoluteReturn': value / invested - 1,
+        'xirr': xirr(times, flows),
+    }
+
+    result = {}
+    for name, values in stats.items():
+        result[name] = np.full(n, np.nan)
+        result[name][valid] = values
+    return result
+
+
+def xirr(times, flows, tol=1e-10, max_iter=100):
+    """
+    Vectorized XIRR of many cash flow schedules at once: the annual rate r of every row with
+    sum(flows * (1 + r)**-times) == 0. All rows are solved together by Newton's method on log(1 + r),
+    a step leaving the bracket known to hold the root falls back to bisection.
+    :param times: rows x flows np.ndarray of years since the first flow
+    :param flows: rows x flows np.ndarray of cash flows, NaN for padding
+    :return: np.ndarray of annual rates, NaN where the flows have no root in the bracket
+    """
+    times = np.asarray(times, dtype=float)
+    flows = np.nan_to_num(np.asarray(flows, dtype=float))
+
+    def npv(x):
+        discounted = flows * np.exp(-x[:, None] * times)
+        return discounted.sum(axis=1), -(discounted * times).sum(axis=1)
+
+    rows = len(flows)
+    lo, hi = np.full(rows, -LOG_RATE_LIMIT), np.full(rows, LOG_RATE_LIMIT)
+    f_lo, _ = npv(lo)
+    f_hi, _ = npv(hi)
+    solvable = np.sign(f_lo) * np.sign(f_hi) <= 0
+
+    # Starting point: money multiple over the gap between the average times of inflows and outflows
+    inflows, outflows = np.maximum(flows, 0), np.maximum(-flows, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gap = (inflows*times).sum(axis=1)/inflows.sum(axis=1) - (outflows*times).sum(axis=1)/outflows.sum(axis=1)
+        x = np.log(inflows.sum(axis=1) / outflows.sum(axis=1)) / np.maximum(gap, 1/365)
+    x = np.where(np.isfinite(x), np.clip(x, lo, hi), 0.0)
+
+    for _ in range(max_iter):
+        f, df = npv(x)
+        # Keep the half of the bracket that still holds the sign change
+        left = np.sign(f) == np.sign(f_lo)
+        lo, f_lo = np.where(left, x, lo), np.where(left, f, f_lo)
+        hi = np.where(left, hi, x)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = x - f / df
+        step = np.where(np.isfinite(step) & (step > lo) & (step < hi), step, (lo + hi) / 2)
+        done = (np.abs(step - x) < tol) | (f == 0)
+        x = np.where(f == 0, x, step)
+        if done.all():
+            break
+
+    return np.where(solvable, np.expm1(x), np.nan)
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# Modules live at the repository root, the synthetic universe in benchmarks
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'benchmarks'))
+
+
+@pytest.fixture
+def synthetic(tmp_path):
+    """
+    Points ratios at a synthetic universe of 8 funds with its caches under tmp_path, see fakes.install.
+    :return: list of fund names
+    """
+    import fakes
+    import ratios
+    from incremental import RollingCache
+
+    saved = {name: getattr(ratios, name) for name in ('nav_store', 'rolling_cache', 'nav_panel', 'result_cache')}
+    lazy = dict(ratios._lazy)
+    funds = fakes.install(8, nav_root=str(tmp_path / 'nav'))
+    ratios.rolling_cache = RollingCache(root=str(tmp_path / 'rolling'))
+    ratios.nav_panel = None
+    yield funds
+
+    for name, value in saved.items():
+        setattr(ratios, name, value)
+    ratios._lazy.clear()
+    ratios._lazy.update(lazy)
@@ -0,0 +1,91 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('aiohttp')
+
+import fakes
+import nav_server
+from data_sources import HttpSource
+from nav_store import NavStore
+
+START, END = '2020-01-01', '2021-01-01'
+
+
+@pytest.fixture
+def server():
+    server, base_url = nav_server.serve()
+    yield base_url, server.RequestHandlerClass.requests
+    server.shutdown()
+
+
+def csv_source(base_url, **kwargs):
+    return HttpSource(base_url + '/nav/{symbol}.csv?start={start}&end={end}', backoff=0.01, **kwargs)
+
+
+def test_csv_response(server):
+    base_url, _ = server
+    nav_df = csv_source(base_url).fetch('0PSYND0000.BO', START, END)
+
+    expected = fakes.fake_downloader('0PSYND0000.BO', START, END)
+    np.testing.assert_array_equal(nav_df['date'].to_numpy(), expected['date'].to_numpy())
+    np.testing.assert_allclose(nav_df['nav'], expected['nav'])
+
+
+def test_json_response(server):
+    base_url, _ = server
+    source = HttpSource(base_url + '/nav/{symbol}.json', date_format='%d-%m-%Y')
+    nav_df = source.fetch('0PSYND0000.BO', START, END)
+
+    # The full history is served, only [start, end) is kept
+    expected = fakes.fake_downloader('0PSYND0000.BO', START, END)
+    np.testing.assert_array_equal(nav_df['date'].to_numpy(), expected['date'].to_numpy())
+    np.testing.assert_allclose(nav_df['nav'], expected['nav'], atol=1e-4)
+
+
+def test_partial_failures_and_retries(server):
+    base_url, requests = server
+    symbols = ['0PSYND0000.BO', 'MISSING0000.BO', 'ERROR0000.BO', 'FLAKY0000.BO']
+    result = csv_source(base_url, retries=2).fetch_many([(symbol, START, END) for symbol in symbols])
+
+    assert not result.ok
+    assert set(result.navs) == {('0PSYND0000.BO', START, END), ('FLAKY0000.BO', START, END)}
+    assert result.failures[('MISSING0000.BO', START, END)].status == 404
+    assert result.failures[('ERROR0000.BO', START, END)].status == 500
+    # A 404 is not retried, a 500 is until retries run out, a retried 503 succeeds
+    assert requests['MISSING0000.BO'] == 1
+    assert requests['ERROR0000.BO'] == 3
+    assert requests['FLAKY0000.BO'] == 2
+
+    with pytest.raises(Exception, match='404'):
+        csv_source(base_url).fetch('MISSING0000.BO', START, END)
+
+
+def test_fetch_many_from_a_running_event_loop(server):
+    base_url, _ = server
+    source = csv_source(base_url)
+
+    async def notebook_cell():
+        # As in a Jupyter kernel, whose event loop is running
+        return source.fetch_many([('0PSYND0000.BO', START, END), ('0PSYND0001.BO', START, END)])
+
+    result = asyncio.run(notebook_cell())
+    assert result.ok and len(result.navs) == 2
+
+
+def test_nav_store_refresh(server, tmp_path):
+    base_url, requests = server
+    store = NavStore(root=str(tmp_path), downloader=csv_source(base_url, retries=0))
+    symbols = ['0PSYND0000.BO', '0PSYND0001.BO', 'ERROR0000.BO']
+
+    failures = store.refresh(symbols, START, END)
+    assert list(failures) == ['ERROR0000.BO']
+    assert store.symbols() == ['0PSYND0000.BO', '0PSYND0001.BO']
+
+    # Fresh histories are served from the cache
+    failures = store.refresh(symbols[:2], START, END)
+    assert failures == {} and requests['0PSYND0000.BO'] == 1
+    pd.testing.assert_frame_equal(store.get('0PSYND0000.BO', START, END),
+                                  fakes.fake_downloader('0PSYND0000.BO', START, END))
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+import fakes
+import instrumentation
+import ratios
+import rolling_engine
+from incremental import RollingCache
+
+DAYS = 365
+
+
+def history(n, symbol='0PSYND0000.BO'):
+    nav = fakes.synthetic_nav(symbol).iloc[:n]
+    return nav['date'].to_numpy(), nav['nav'].to_numpy()
+
+
+def full(dates, navs, match='exact'):
+    return rolling_engine.absolute_returns(navs, rolling_engine.window_start_indices(dates, DAYS, match))
+
+
+def rolling_ratio(cache, dates, navs, match='exact'):
+    with instrumentation.collect() as stats:
+        ratio = cache.rolling_ratio(('0PSYND0000.BO', '1y', DAYS, match), dates, navs,
+                                    rolling_engine.absolute_returns, DAYS, match)
+    return ratio, stats.counters
+
+
+@pytest.mark.parametrize('match', rolling_engine.MATCH_MODES)
+def test_appended_dates_only_compute_their_windows(tmp_path, match):
+    cache = RollingCache(root=str(tmp_path))
+    dates, navs = history(1000)
+    rolling_ratio(cache, dates[:990], navs[:990], match)
+
+    ratio, counters = rolling_ratio(cache, dates, navs, match)
+    np.testing.assert_array_equal(ratio, full(dates, navs, match))
+    assert counters['rolling_cache_hits'] == 1
+    assert counters['windows'] <= 10
+
+
+def test_revised_nav_is_recomputed_in_full(tmp_path):
+    cache = RollingCache(root=str(tmp_path))
+    dates, navs = history(1000)
+    rolling_ratio(cache, dates[:990], navs[:990])
+
+    revised = navs.copy()
+    revised[500] *= 1.01
+    ratio, counters = rolling_ratio(cache, dates, revised)
+    np.testing.assert_array_equal(ratio, full(dates, revised))
+    assert counters['rolling_cache_misses'] == 1
+
+
+def test_later_period_start_matches_a_full_recompute(tmp_path):
+    cache = RollingCache(root=str(tmp_path))
+    dates, navs = history(1000)
+    rolling_ratio(cache, dates, navs)
+
+    # As a period counted back from a later day starts later
+    ratio, counters = rolling_ratio(cache, dates[100:], navs[100:])
+    np.testing.assert_array_equal(ratio, full(dates[100:], navs[100:]))
+    assert counters['rolling_cache_hits'] == 1
+
+
+def test_window_days_are_part_of_the_key(synthetic, monkeypatch):
+    measures = ratios.Measures(synthetic[0])
+    convert_period_to_days = ratios.convert_period_to_days
+
+    # '1y' is 366 days when it spans a 29 February and 365 days otherwise
+    for extra in (1, 0):
+        monkeypatch.setattr(ratios, 'convert_period_to_days',
+                            lambda period, extra=extra: convert_period_to_days(period) + extra)
+        incremental = measures.rolling_returns('1y', '5y', incremental=True)
+        np.testing.assert_array_equal(incremental['ratio'], measures.rolling_returns('1y', '5y')['ratio'])
@@ -0,0 +1,74 @@
+import os
+
+import pandas as pd
+import pytest
+
+import ratios
+from memo import ResultCache
+
+
+def frame(n):
+    return pd.DataFrame({'date': pd.date_range('2020-01-01', periods=n), 'ratio': range(n)})
+
+
+def test_least_recently_used_results_are_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put('a', frame(3))
+    cache.put('b', frame(3))
+    cache.get('a')
+    cache.put('c', frame(3))
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
+
+    small = ResultCache(max_bytes=frame(100).memory_usage(index=True).sum() * 3 // 2)
+    small.put('a', frame(100))
+    small.put('b', frame(100))
+    assert small.get('a') is None and small.get('b') is not None
+
+
+def test_results_are_copies():
+    cache = ResultCache()
+    cache.put('a', frame(3))
+    result = cache.get('a')
+    result['ratio'] = 0
+    assert cache.get('a')['ratio'].tolist() == [0, 1, 2]
+
+
+def test_disk_round_trip(tmp_path):
+    ResultCache(root=str(tmp_path)).put(('symbol', 'rolling_returns'), (frame(5), frame(2)))
+
+    cache = ResultCache(root=str(tmp_path))
+    returns, summary = cache.get(('symbol', 'rolling_returns'))
+    pd.testing.assert_frame_equal(returns, frame(5))
+    pd.testing.assert_frame_equal(summary, frame(2))
+    assert cache.stats()['diskHits'] == 1
+    assert cache.get(('symbol', 'other')) is None
+
+
+# A truncated file, and pickles of a class and a module other versions of pandas or numpy may not have
+@pytest.mark.parametrize('body', [b'\x80\x04\x95', b'\x80\x04cmemo\nNoSuchClass\n.', b'\x80\x04cno_such_module\nX\n.'])
+def test_unreadable_results_are_misses(tmp_path, body):
+    cache = ResultCache(root=str(tmp_path))
+    with open(cache.path('a'), 'wb') as f:
+        f.write(body)
+
+    assert cache.get('a') is None
+    assert not os.path.exists(cache.path('a'))
+
+
+def test_memoized_results_follow_the_nav_version(synthetic):
+    ratios.result_cache = cache = ResultCache()
+    measures = ratios.Measures(synthetic[0])
+
+    first = measures.rolling_returns('1y', '3y')
+    measures.rolling_returns('1y', '3y')
+    assert cache.stats()['hits'] == 1
+
+    # A longer period rewrites the history with another version
+    version = ratios.nav_version(measures.scheme_details.symbol)
+    measures.rolling_returns('1y', '5y')
+    assert ratios.nav_version(measures.scheme_details.symbol) != version
+    assert len(measures.rolling_returns('1y', '3y')) == len(first)
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,82 @@
+import datetime
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import fakes
+from nav_store import NavStore
+
+
+class CountingDownloader:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, symbol, start, end):
+        self.calls.append((symbol, start, end))
+        return fakes.fake_downloader(symbol, start, end)
+
+
+def test_only_missing_ranges_are_downloaded(tmp_path):
+    downloader = CountingDownloader()
+    store = NavStore(root=str(tmp_path), downloader=downloader)
+
+    store.get('0PSYND0000.BO', '2020-01-01', '2021-01-01')
+    nav = store.get('0PSYND0000.BO', '2019-01-01', '2022-01-01')
+
+    assert downloader.calls == [
+        ('0PSYND0000.BO', '2020-01-01', '2021-01-01'),
+        ('0PSYND0000.BO', '2019-01-01', '2020-01-01'),
+        ('0PSYND0000.BO', '2021-01-01', '2022-01-01'),
+    ]
+    pd.testing.assert_frame_equal(nav, fakes.fake_downloader('0PSYND0000.BO', '2019-01-01', '2022-01-01'))
+
+    # A range inside the covered one is served from the cache
+    store.get('0PSYND0000.BO', '2019-06-01', '2021-06-01')
+    assert len(downloader.calls) == 3
+
+
+def test_stale_tail_is_fetched_again_from_the_last_nav(tmp_path):
+    downloader = CountingDownloader()
+    store = NavStore(root=str(tmp_path), downloader=downloader, max_age=datetime.timedelta(0))
+
+    nav = store.get('0PSYND0000.BO', '2020-01-01', '2021-01-01')
+    store.get('0PSYND0000.BO', '2020-01-01', '2021-01-01')
+
+    last = str(nav['date'].iloc[-1].date())
+    assert downloader.calls[1] == ('0PSYND0000.BO', last, '2021-01-01')
+    assert store.version('0PSYND0000.BO') is None
+
+
+def test_offline_store_never_downloads(tmp_path):
+    downloader = CountingDownloader()
+    NavStore(root=str(tmp_path), downloader=downloader).get('0PSYND0000.BO', '2020-01-01', '2021-01-01')
+
+    offline = NavStore(root=str(tmp_path), downloader=downloader, max_age=datetime.timedelta(0), offline=True)
+    assert len(offline.get('0PSYND0000.BO', '2019-01-01', '2022-01-01')) == len(
+        fakes.fake_downloader('0PSYND0000.BO', '2020-01-01', '2021-01-01'))
+    assert len(offline.get('0PSYND0001.BO', '2020-01-01', '2021-01-01')) == 0
+    # An offline store serves what it has however old, so its version stays valid
+    assert offline.version('0PSYND0000.BO') is not None
+    assert len(downloader.calls) == 1
+
+
+@pytest.mark.parametrize('keep_loaded', [False, True])
+def test_least_recently_used_symbols_are_evicted(tmp_path, keep_loaded):
+    symbols = [f'0PSYND{i:04d}.BO' for i in range(4)]
+    store = NavStore(root=str(tmp_path), downloader=fakes.fake_downloader, keep_loaded=keep_loaded)
+    for symbol in symbols[:3]:
+        store.get(symbol, '2020-01-01', '2021-01-01')
+    size = os.path.getsize(store.path(symbols[0]))
+
+    # Reading the first symbol makes the second the least recently used
+    past = time.time() - 60
+    for i, symbol in enumerate(symbols[:3]):
+        os.utime(store.path(symbol), (past + i, past + i))
+    store.get(symbols[0], '2020-01-01', '2021-01-01')
+
+    store.max_bytes = 3 * size + size // 2
+    store.get(symbols[3], '2020-01-01', '2021-01-01')
+    assert store.symbols() == [symbols[0], symbols[2], symbols[3]]
+    assert symbols[1] not in store._loaded
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import panel_snapshot
+import ratios
+
+
+def test_get_nav_reads_the_store_for_a_period_longer_than_the_snapshot(synthetic, tmp_path):
+    details = ratios.SchemeDetails(synthetic[0])
+    path = ratios.export_nav_panel(str(tmp_path / 'panel.bin'), [details.symbol], period='3y')
+    ratios.use_nav_panel(path)
+
+    expected = ratios.nav_store.get(details.symbol, str(ratios.convert_period_to_date('8y')), str(pd.Timestamp.today().date()))
+    nav = details.get_nav('8y')
+    assert len(nav) == len(expected) > len(details.get_nav('3y'))
+    assert len(ratios.Measures(synthetic[0]).cagr_rolling_returns('5y', '8y')) > 0
+
+
+def test_get_nav_slices_the_snapshot_for_a_period_it_covers(synthetic, tmp_path):
+    details = ratios.SchemeDetails(synthetic[0])
+    path = ratios.export_nav_panel(str(tmp_path / 'panel.bin'), [details.symbol], period='3y')
+    panel = ratios.use_nav_panel(path)
+
+    nav = details.get_nav('2y')
+    dates, navs = panel.series(details.symbol, str(ratios.convert_period_to_date('2y')))
+    np.testing.assert_array_equal(nav['nav'].to_numpy(), navs[~np.isnan(navs)])
+    assert panel.covers(ratios.convert_period_to_date('2y'), pd.Timestamp.today().date())
+    assert not panel.covers(ratios.convert_period_to_date('8y'))
+
+
+def test_snapshot_is_not_used_once_the_store_has_newer_navs(synthetic, tmp_path):
+    details = ratios.SchemeDetails(synthetic[0])
+    start = ratios.convert_period_to_date('3y')
+    # A snapshot exported a week ago, served while the store has nothing newer
+    end = pd.Timestamp.today().normalize() - pd.Timedelta(days=7)
+    old = ratios.nav_store.get(details.symbol, str(start), str(end.date()))
+    path = str(tmp_path / 'panel.bin')
+    panel_snapshot.write(path, old['date'].values, [details.symbol], old[['nav']].to_numpy(), start=start, end=end)
+    ratios.use_nav_panel(path)
+    assert details.get_nav('1y')['date'].iloc[-1] == old['date'].iloc[-1]
+
+    # The store then reads the NAVs of the last week
+    ratios.nav_store.get(details.symbol, str(start), str(pd.Timestamp.today().date()))
+    assert details.get_nav('1y')['date'].iloc[-1] > old['date'].iloc[-1]
+
+
+def test_unknown_snapshot_versions_are_rejected(tmp_path, monkeypatch):
+    path = str(tmp_path / 'panel.bin')
+    monkeypatch.setattr(panel_snapshot, 'VERSION', 2)
+    panel_snapshot.write(path, np.array(['2020-01-01'], dtype='datetime64[ns]'), ['A'], [[1.0]])
+    monkeypatch.undo()
+
+    with pytest.raises(ValueError, match='version 2'):
+        panel_snapshot.PanelSnapshot.open(path)
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+import ranking
+
+
+def test_rank_panel_matches_dataframe_rank():
+    rng = np.random.default_rng(0)
+    returns = rng.normal(size=(50, 9)).round(1)
+    returns[rng.random(returns.shape) < 0.2] = np.nan
+
+    percentile, _ = ranking.rank_panel(returns)
+
+    expected = pd.DataFrame(returns).rank(axis=1, pct=True).to_numpy()
+    np.testing.assert_allclose(percentile, expected, equal_nan=True)
+
+
+def test_quartiles_of_four_funds():
+    _, quartile = ranking.rank_panel([[4.0, 3.0, 2.0, 1.0]])
+    assert quartile.tolist() == [[1, 2, 3, 4]]
+
+
+def test_best_fund_of_small_category_is_top_quartile():
+    _, quartile = ranking.rank_panel([[1.0, np.nan], [0.1, 0.3], [0.2, 0.3], [0.3, 0.2]])
+    assert quartile[0, 0] == 1
+    assert np.isnan(quartile[0, 1])
+
+    # Three funds, as in the Contra category
+    _, quartile = ranking.rank_panel([[0.1, 0.3, 0.2]])
+    assert quartile.tolist() == [[3, 1, 2]]
+
+
+def test_top_quartile_share_of_three_fund_category():
+    dates = pd.date_range('2020-01-01', periods=4)
+    wide = pd.DataFrame({'A': [0.3, 0.3, 0.1, 0.2], 'B': [0.2, 0.1, 0.3, 0.1], 'C': [0.1, 0.2, 0.2, 0.3]}, index=dates)
+
+    _, scores = ranking.rank_category(wide)
+
+    assert scores['topQuartileShare'].tolist() == [0.5, 0.25, 0.25]
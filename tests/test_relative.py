@@ -0,0 +1,16 @@
+import numpy as np
+
+import ratios
+
+
+def test_full_period_captures_match_the_linked_returns(synthetic):
+    measures = ratios.Measures(synthetic[0])
+    stats = measures.relative_statistics('5y')
+
+    returns = measures._returns_against_benchmark('5y', '1d', None)
+    up = returns['benchmark'] >= 0
+    linked = (1 + returns[['fund', 'benchmark']]).groupby(up).prod() - 1
+    captures = linked['fund'] / linked['benchmark'] * 100
+    np.testing.assert_allclose([stats['upsideCapture'], stats['downsideCapture']], [captures[True], captures[False]],
+                               rtol=1e-9)
+
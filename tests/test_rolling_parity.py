@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import rolling_engine
+from ratios import subtract_days
+
+
+def synthetic_nav(n_days=800, seed=0):
+    # Weekdays less a few random holidays, so some window starts fall on a missing date
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2015-01-01', periods=n_days)
+    dates = dates[rng.random(len(dates)) > 0.03]
+    navs = 100 * np.exp(np.cumsum(rng.normal(0.0004, 0.01, len(dates))))
+    return pd.DataFrame({'date': dates, 'nav': navs})
+
+
+def sample(nav, sampling_period):
+    if sampling_period == '1d':
+        return nav
+    return nav.resample(sampling_period, on='date').last().reset_index()
+
+
+def apply_absolute(nav, days):
+    # The rolling().apply closures rolling_engine replaced, kept as the reference it must match
+    def absolute(x):
+        x = x.reset_index()
+        first = x.iloc[0]
+        last = x.iloc[-1]
+        # 1 is subtracted from days as window has one day less
+        if first['date'] != subtract_days(last['date'], days-1):
+            return np.nan
+
+        # nav is in column 0
+        return last[0]/first[0] - 1
+
+    return nav.rolling(window=str(days)+'D', on='date')['nav'].apply(absolute).to_numpy()
+
+
+def apply_cagr(nav, days):
+    years = int(days/365)
+
+    def cagr(x):
+        x = x.reset_index()
+        first = x.iloc[0]
+        last = x.iloc[-1]
+        # 1 is subtracted from days as window has one day less
+        if first['date'] != subtract_days(last['date'], days-1):
+            return np.nan
+
+        # nav is in column 0
+        return (last[0]/first[0])**(1/years) - 1
+
+    return nav.rolling(window=str(days)+'D', on='date')['nav'].apply(cagr).to_numpy()
+
+
+def prior_absolute(nav, days):
+    # Windows start on the last NAV at or before the start date, one lookup per window
+    series = nav.set_index('date')['nav']
+    first_date = series.index[0]
+    ratios = []
+    for date, last in series.items():
+        target = subtract_days(date, days-1)
+        ratios.append(np.nan if target < first_date else last / series.asof(target) - 1)
+    return np.array(ratios)
+
+
+# Resampled windows only start exactly on a sampled date when days-1 is a multiple of the sampling period
+WINDOWS = [('1d', 30), ('1d', 365), ('W', 92), ('W', 365), ('2W', 365)]
+
+
+@pytest.mark.parametrize('sampling_period, days', WINDOWS)
+def test_absolute_returns_match_rolling_apply(sampling_period, days):
+    nav = sample(synthetic_nav(), sampling_period)
+    dates, navs = nav['date'].values, nav['nav'].to_numpy(dtype=float)
+
+    expected = apply_absolute(nav, days)
+    assert np.isfinite(expected).sum() > 10
+    start = rolling_engine.window_start_indices(dates, days)
+    np.testing.assert_array_equal(rolling_engine.absolute_returns(navs, start), expected)
+
+
+@pytest.mark.parametrize('sampling_period, days', [('1d', 1095), ('W', 1107)])
+def test_cagr_returns_match_rolling_apply(sampling_period, days):
+    nav = sample(synthetic_nav(1200), sampling_period)
+    dates, navs = nav['date'].values, nav['nav'].to_numpy(dtype=float)
+
+    expected = apply_cagr(nav, days)
+    assert np.isfinite(expected).sum() > 10
+    start = rolling_engine.window_start_indices(dates, days)
+    # Python's float power and np.power can differ in the last bit
+    np.testing.assert_allclose(rolling_engine.cagr_returns(navs, start, 3), expected, rtol=1e-12)
+    # multi_window_returns takes the same windows from log NAVs
+    np.testing.assert_allclose(rolling_engine.log_returns(np.log(navs), start, 3), expected, rtol=1e-10)
+
+
+@pytest.mark.parametrize('sampling_period, days', WINDOWS)
+def test_prior_match_uses_last_earlier_nav(sampling_period, days):
+    nav = sample(synthetic_nav(), sampling_period)
+    dates, navs = nav['date'].values, nav['nav'].to_numpy(dtype=float)
+
+    start = rolling_engine.window_start_indices(dates, days, 'prior')
+    returns = rolling_engine.absolute_returns(navs, start)
+    np.testing.assert_array_equal(returns, prior_absolute(nav, days))
+    # Every window found exactly is found the same way by prior
+    exact = apply_absolute(nav, days)
+    np.testing.assert_array_equal(returns[~np.isnan(exact)], exact[~np.isnan(exact)])
@@ -0,0 +1,42 @@
+import http.client
+import json
+from urllib.parse import urlencode, urlparse
+
+import service
+
+
+def test_unknown_fund_is_404(synthetic):
+    status, body = service.QueryService().handle('/scheme', {'fund': 'No Such Fund'})
+    assert status == 404
+    assert 'Could not resolve fund' in json.loads(body)['error']
+
+
+def test_invalid_window_of_a_resolved_fund_is_400(synthetic):
+    status, body = service.QueryService().handle('/sip', {'fund': synthetic[0], 'window': '90d'})
+    assert status == 400
+    assert 'at least one month' in json.loads(body)['error']
+
+
+def test_internal_lookup_errors_do_not_blame_the_fund(synthetic):
+    query_service = service.QueryService()
+
+    def failing(params):
+        query_service.measures(params['fund'])
+        return {}['missing']
+
+    query_service.routes['/failing'] = failing
+    status, body = query_service.handle('/failing', {'fund': synthetic[0]})
+    assert status == 500
+    assert json.loads(body)['error'] == "KeyError: 'missing'"
+
+
+def test_served_over_http(synthetic):
+    server, base_url = service.serve(service.QueryService(), port=0)
+    try:
+        connection = http.client.HTTPConnection(urlparse(base_url).hostname, urlparse(base_url).port)
+        connection.request('GET', '/rolling_returns?' + urlencode({'fund': synthetic[0], 'window': '1y'}))
+        response = connection.getresponse()
+        assert response.status == 200
+        assert len(json.loads(response.read())) > 0
+    finally:
+        server.shutdown()
@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+import sip
+
+
+def test_rolling_sip_rejects_windows_shorter_than_a_month():
+    dates = np.arange('2020-01-01', '2021-01-01', dtype='datetime64[D]')
+    with pytest.raises(ValueError, match='at least one month'):
+        sip.rolling_sip(dates, np.linspace(10, 12, len(dates)), 0)
+
+
+def test_rolling_sip_of_a_flat_nav_returns_nothing():
+    dates = np.arange('2020-01-01', '2022-01-01', dtype='datetime64[D]')
+    stats = sip.rolling_sip(dates, np.full(len(dates), 10.0), 12, amount=100)
+    valid = ~np.isnan(stats['value'])
+    assert valid.sum() > 300
+    np.testing.assert_allclose(stats['value'][valid], 1200)
+    np.testing.assert_allclose(stats['xirr'][valid], 0, atol=1e-8)
@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+import correlation
+import instrumentation
+import ratios
+import risk
+import rolling_engine
+
+
+class Universe:
+    """
+    Many funds resolved once and held as one aligned dates x funds NAV panel, so rolling returns
+    of every fund are computed in a single vectorized pass.
+    By default the universe is every fund in equity_schemes.csv plus the YFINANCE_INDEX_CODES benchmarks.
+    """
+
+    def __init__(self, funds=None, period='15y', benchmarks=True):
+        if funds is None:
+            funds = list(ratios.eq_schemes['scheme_name'].dropna().unique())
+        if benchmarks:
+            funds = list(funds) + [b for b in ratios.YFINANCE_INDEX_CODES if b not in funds]
+
+        self.period = period
+        self.scheme_details, self.unresolved = self._resolve(funds)
+        self.details = pd.concat([sd.get_scheme_details() for sd in self.scheme_details], ignore_index=True)
+        navs = [sd.get_nav(period) for sd in self.scheme_details]
+        with instrumentation.stage('align'):
+            self.dates, self.panel = align_navs(navs)
+
+    def rolling_returns(self, window, sampling_period='1d', match='exact', wide=False):
+        return self._rolling_returns(rolling_engine.absolute_returns, window, sampling_period, match, wide)
+
+    def cagr_rolling_returns(self, window, sampling_period='1d', match='exact', wide=False):
+        days = ratios.convert_period_to_days(window)
+        if days <= 365:
+            return self.rolling_returns(window, sampling_period, match, wide)
+
+        years = int(days/365)
+
+        def cagr(navs, start):
+            return rolling_engine.cagr_returns(navs, start, years)
+
+        return self._rolling_returns(cagr, window, sampling_period, match, wide)
+
+    def _rolling_returns(self, returns_func, window, sampling_period, match, wide):
+        dates, panel = self._sample(sampling_period)
+        days = ratios.convert_period_to_days(window)
+
+        with instrumentation.stage('rolling'):
+            start = rolling_engine.panel_window_start_indices(dates, panel, days, match)
+            returns = returns_func(panel, start)
+        instrumentation.count('rows', panel.size)
+        instrumentation.count('windows', int((start >= 0).sum()))
+
+        if wide:
+            wide_df = pd.DataFrame(returns, index=pd.Index(dates, name='date'), columns=self.details['schemeName'])
+            return wide_df.dropna(how='all')
+
+        # Same long layout as Measures.rolling_returns, ordered by fund then date
+        cols, rows = np.nonzero(~np.isnan(returns.T))
+        return pd.DataFrame({
+            'symbol': self.details['symbol'].to_numpy()[cols],
+            'schemeName': self.details['schemeName'].to_numpy()[cols],
+            'category': self.details['category'].to_numpy()[cols],
+            'date': dates[rows],
+            'nav': panel[rows, cols],
+            'ratio': returns[rows, cols],
+        })
+
+    def rolling_risk_statistics(self, window, sampling_period='1d', risk_free=0.0):
+        """
+        Measures.rolling_risk_statistics of every fund from one pass over the panel, in the long layout
+        of rolling_returns with one column per statistic.
+        """
+        dates, panel = self._sample(sampling_period)
+        days = ratios.convert_period_to_days(window)
+
+        with instrumentation.stage('risk'):
+            stats = risk.risk_statistics(dates, panel, days, risk_free)
+
+        cols, rows = np.nonzero(~np.isnan(stats['volatility'].T))
+        return pd.DataFrame({
+            'symbol': self.details['symbol'].to_numpy()[cols],
+            'schemeName': self.details['schemeName'].to_numpy()[cols],
+            'category': self.details['category'].to_numpy()[cols],
+            'date': dates[rows],
+            **{name: values[rows, cols] for name, values in stats.items()},
+        })
+
+    def correlation(self, sampling_period='1d', view='all', top_k=None, min_periods=2):
+        """
+        Correlation of every pair of funds' periodic returns over the whole period, each pair over the dates
+        both have a return.
+        :param view: 'all' pairs, pairs 'within' a category or pairs 'across' categories, others are NaN
+        :param top_k: only the top_k most correlated pairs in view, as a long frame
+        :return: funds x funds pd.DataFrame labelled by schemeName, or the top_k pairs
+        """
+        dates, panel = self._sample(sampling_period)
+        with instrumentation.stage('correlation'):
+            corr = correlation.correlation_matrix(rolling_engine.panel_returns(panel), min_periods)
+        mask = correlation.view_mask(self.details['category'], view)
+
+        if top_k is not None:
+            return correlation.pairs_frame(self.details, *correlation.top_pairs(corr, top_k, mask))
+        names = self.details['schemeName']
+        return pd.DataFrame(np.where(mask, corr, np.nan), index=names.to_numpy(), columns=names.to_numpy())
+
+    def rolling_correlation(self, window, step=21, sampling_period='1d', view='all', top_k=None, min_periods=2):
+        """
+        Correlation matrices of windows of the given length ending on every step-th date, counted back from
+        the last date. The window sums are updated incrementally from one window to the next.
+        :param top_k: only the top_k most correlated pairs in view of every window, as a long frame,
+        which keeps memory at ends x top_k instead of ends x funds x funds
+        :return: (end dates, ends x funds x funds np.ndarray) in the fund order of details, or the top_k pairs
+        """
+        dates, panel = self._sample(sampling_period)
+        days = ratios.convert_period_to_days(window)
+        mask = correlation.view_mask(self.details['category'], view)
+
+        returns = rolling_engine.panel_returns(panel)
+        with instrumentation.stage('correlation'):
+            if top_k is None:
+                ends, matrices = correlation.rolling_correlation_matrices(dates, returns, days, step, min_periods)
+                return ends, np.where(mask, matrices, np.nan)
+
+            frames = [correlation.pairs_frame(self.details, *correlation.top_pairs(corr, top_k, mask), date=end)
+                      for end, corr in correlation.iter_rolling_correlation(dates, returns, days, step, min_periods)]
+        if not frames:
+            return correlation.pairs_frame(self.details, [], [], [], date=[])
+        return pd.concat(frames, ignore_index=True)
+
+    def _sample(self, sampling_period):
+        if sampling_period == '1d':
+            return self.dates, self.panel
+
+        sampled = pd.DataFrame(self.panel, index=self.dates).resample(sampling_period).last()
+        return sampled.index.to_numpy(dtype='datetime64[ns]'), sampled.to_numpy(dtype=float)
+
+    def _resolve(self, funds):
+        resolved = []
+        unresolved = []
+        symbols = set()
+        for fund in funds:
+            try:
+                sd = ratios.SchemeDetails(fund)
+                symbol = sd.get_scheme_details()['symbol'].iloc[0]
+            except (AssertionError, IndexError, KeyError):
+                unresolved.append(fund)
+                continue
+
+            if not isinstance(symbol, str) or symbol == '':
+                unresolved.append(fund)
+            elif symbol not in symbols:
+                symbols.add(symbol)
+                resolved.append(sd)
+        return resolved, unresolved
+
+
+def align_navs(nav_dfs):
+    """
+    Function to align NAV frames with 'date' and 'nav' columns on the union of their dates.
+    :param nav_dfs: list of pd.DataFrame
+    :return: (dates, panel) where panel is a dates x funds np.ndarray with NaN where a fund has no NAV
+    """
+    fund_dates = [nav_df['date'].to_numpy(dtype='datetime64[ns]') for nav_df in nav_dfs]
+    dates = np.unique(np.concatenate(fund_dates)) if fund_dates else np.array([], dtype='datetime64[ns]')
+
+    panel = np.full((len(dates), len(nav_dfs)), np.nan)
+    for j, nav_df in enumerate(nav_dfs):
+        panel[np.searchsorted(dates, fund_dates[j]), j] = nav_df['nav'].to_numpy(dtype=float)
+    return dates, panel